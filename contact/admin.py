@@ -1,5 +1,32 @@
-from django.contrib import admin
-from .models import ContactMessage, CallSchedule
+from django.contrib import admin, messages
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import ContactMessage, CallSchedule, Attachment
+from .tasks import schedule_call_reminder
+from .transitions import mark_messages, transition_calls
+
+
+class AttachmentInline(admin.TabularInline):
+    model = Attachment
+    fields = ['original_name', 'size', 'content_type', 'created_at', 'download']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('file')
+    
+    def size(self, obj):
+        return obj.file.size
+    
+    def content_type(self, obj):
+        return obj.file.content_type
+    
+    def download(self, obj):
+        return format_html('<a href="{}">Download</a>', reverse('attachments-download', args=[obj.pk]))
 
 
 @admin.register(ContactMessage)
@@ -9,6 +36,7 @@ class ContactMessageAdmin(admin.ModelAdmin):
     search_fields = ['name', 'email', 'project', 'message']
     readonly_fields = ['created_at']
     date_hierarchy = 'created_at'
+    inlines = [AttachmentInline]
     
     fieldsets = (
         ('Contact Information', {
@@ -23,11 +51,13 @@ class ContactMessageAdmin(admin.ModelAdmin):
     )
     
     def mark_as_read(self, request, queryset):
-        queryset.update(is_read=True)
+        updated = mark_messages(queryset.values_list('id', flat=True), is_read=True)
+        self.message_user(request, f"{updated} messages marked as read.")
     mark_as_read.short_description = "Mark selected messages as read"
     
     def mark_as_unread(self, request, queryset):
-        queryset.update(is_read=False)
+        updated = mark_messages(queryset.values_list('id', flat=True), is_read=False)
+        self.message_user(request, f"{updated} messages marked as unread.")
     mark_as_unread.short_description = "Mark selected messages as unread"
     
     actions = [mark_as_read, mark_as_unread]
@@ -38,8 +68,9 @@ class CallScheduleAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'phone', 'preferred_date', 'preferred_time', 'status', 'created_at']
     list_filter = ['status', 'preferred_date', 'created_at']
     search_fields = ['name', 'email', 'phone', 'topic']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'reminder_task_id', 'reminder_sent_at']
     date_hierarchy = 'preferred_date'
+    inlines = [AttachmentInline]
     
     fieldsets = (
         ('Contact Information', {
@@ -54,18 +85,39 @@ class CallScheduleAdmin(admin.ModelAdmin):
         ('Status', {
             'fields': ('status', 'created_at', 'updated_at')
         }),
+        ('Reminder', {
+            'fields': ('reminder_task_id', 'reminder_sent_at')
+        }),
     )
     
+    def save_model(self, request, obj, form, change):
+        rescheduled = {'preferred_date', 'preferred_time', 'timezone'} & set(form.changed_data)
+        if change and rescheduled:
+            obj.reminder_sent_at = None
+        super().save_model(request, obj, form, change)
+        if not change or rescheduled or 'status' in form.changed_data:
+            schedule_call_reminder(obj)
+    
+    def _transition(self, request, queryset, status):
+        result = transition_calls(dict.fromkeys(queryset.values_list('id', flat=True), status))
+        self.message_user(request, f"{len(result['updated'].get(status, []))} calls marked as {status}.")
+        if result['rejected']:
+            self.message_user(
+                request,
+                f"{len(result['rejected'])} calls skipped: " + ' '.join(sorted(set(result['rejected'].values()))),
+                messages.WARNING,
+            )
+    
     def mark_as_confirmed(self, request, queryset):
-        queryset.update(status='confirmed')
+        self._transition(request, queryset, 'confirmed')
     mark_as_confirmed.short_description = "Mark selected calls as confirmed"
     
     def mark_as_completed(self, request, queryset):
-        queryset.update(status='completed')
+        self._transition(request, queryset, 'completed')
     mark_as_completed.short_description = "Mark selected calls as completed"
     
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(status='cancelled')
+        self._transition(request, queryset, 'cancelled')
     mark_as_cancelled.short_description = "Mark selected calls as cancelled"
     
     actions = [mark_as_confirmed, mark_as_completed, mark_as_cancelled]
@@ -0,0 +1,249 @@
+"""
+Shared SMTP delivery layer for the notification tasks
+
+All mail goes through a circuit breaker whose state lives in Redis, so every
+worker process sees the same view of the relay. While the circuit is open,
+tasks are parked (re-queued for when it may close) without touching the
+database or the relay. Real delivery failures retry with exponential backoff
+and full jitter so queued tasks do not hammer a recovering relay in lockstep.
+"""
+import random
+import smtplib
+import time
+
+import redis
+from celery import Task
+from celery.exceptions import Retry
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .redis_clients import get_client
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+def _get_redis():
+    return get_client(settings.SMTP_BREAKER_REDIS_URL, settings.SMTP_BREAKER_REDIS_TIMEOUT, decode_responses=True)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending while the SMTP circuit is open"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"SMTP circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Process-wide circuit breaker backed by Redis
+
+    Closed: deliveries go through and failures are counted over a sliding
+    window. Open: deliveries are refused until ``reset_timeout`` passes.
+    Half-open: a single probe delivery is let through, and its outcome closes
+    or reopens the circuit. If Redis itself is unreachable the breaker lets
+    deliveries through rather than blocking all mail.
+    """
+
+    def __init__(self, name, failure_threshold, failure_window, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        self.failures_key = f'{name}:failures'
+        self.opened_until_key = f'{name}:opened_until'
+        self.probe_key = f'{name}:probe'
+        self.metrics_key = f'{name}:metrics'
+
+    def _state(self, client):
+        opened_until = client.get(self.opened_until_key)
+        if opened_until is None:
+            return STATE_CLOSED, 0
+        remaining = float(opened_until) - time.time()
+        if remaining > 0:
+            return STATE_OPEN, remaining
+        return STATE_HALF_OPEN, 0
+
+    def _open(self, client):
+        pipe = client.pipeline()
+        pipe.set(self.opened_until_key, time.time() + self.reset_timeout)
+        pipe.delete(self.failures_key, self.probe_key)
+        pipe.hincrby(self.metrics_key, 'opened', 1)
+        pipe.execute()
+
+    def raise_if_open(self):
+        """Cheap pre-check for tasks; never claims the half-open probe"""
+        try:
+            state, remaining = self._state(_get_redis())
+        except redis.RedisError:
+            return
+        if state == STATE_OPEN:
+            raise CircuitOpenError(retry_after=remaining)
+
+    def before_send(self):
+        """Raise CircuitOpenError unless a delivery may be attempted now"""
+        try:
+            client = _get_redis()
+            state, remaining = self._state(client)
+            if state == STATE_CLOSED:
+                return
+            if state == STATE_HALF_OPEN and client.set(self.probe_key, 1, nx=True, ex=self.reset_timeout):
+                return
+            client.hincrby(self.metrics_key, 'short_circuited', 1)
+        except redis.RedisError:
+            return
+        raise CircuitOpenError(retry_after=remaining or self.reset_timeout)
+
+    def record_success(self):
+        try:
+            client = _get_redis()
+            pipe = client.pipeline()
+            pipe.delete(self.failures_key, self.opened_until_key, self.probe_key)
+            pipe.hincrby(self.metrics_key, 'sent', 1)
+            pipe.execute()
+        except redis.RedisError:
+            pass
+
+    def record_failure(self):
+        try:
+            client = _get_redis()
+            client.hincrby(self.metrics_key, 'failed', 1)
+            state, _ = self._state(client)
+            if state != STATE_CLOSED:
+                # The half-open probe failed
+                self._open(client)
+                return
+            pipe = client.pipeline()
+            pipe.incr(self.failures_key)
+            pipe.expire(self.failures_key, self.failure_window)
+            failures, _ = pipe.execute()
+            if failures >= self.failure_threshold:
+                self._open(client)
+        except redis.RedisError:
+            pass
+
+    def metrics(self):
+        """Current breaker state and delivery counters"""
+        client = _get_redis()
+        state, remaining = self._state(client)
+        counters = client.hgetall(self.metrics_key)
+        return {
+            'state': state,
+            'retry_after': round(remaining, 1),
+            'recent_failures': int(client.get(self.failures_key) or 0),
+            **{name: int(counters.get(name, 0)) for name in ('sent', 'failed', 'short_circuited', 'opened')},
+        }
+
+    def reset(self):
+        _get_redis().delete(self.failures_key, self.opened_until_key, self.probe_key, self.metrics_key)
+
+
+smtp_breaker = CircuitBreaker(
+    name=settings.SMTP_BREAKER_KEY_PREFIX,
+    failure_threshold=settings.SMTP_BREAKER_FAILURE_THRESHOLD,
+    failure_window=settings.SMTP_BREAKER_FAILURE_WINDOW,
+    reset_timeout=settings.SMTP_BREAKER_RESET_TIMEOUT,
+)
+
+
+def is_relay_failure(exc):
+    """Whether an exception says the relay is unhealthy, not one recipient"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return False
+    return isinstance(exc, (smtplib.SMTPException, OSError))
+
+
+def open_connection(connection):
+    """
+    Open a mail connection so the emails sent through it share one SMTP session
+
+    Without this, the SMTP backend opens and closes a session for every
+    ``send_mail``. A relay that cannot be reached counts towards the circuit
+    like a failed send.
+    """
+    try:
+        connection.open()
+    except Exception as exc:
+        if is_relay_failure(exc):
+            smtp_breaker.record_failure()
+        raise
+    return connection
+
+
+def deliver_mail(subject, message, from_email, recipient_list, fail_silently=False, connection=None):
+    """
+    ``django.core.mail.send_mail`` behind the SMTP circuit breaker
+
+    Raises CircuitOpenError while the circuit is open so the caller can park
+    its task. With ``fail_silently`` the message is treated as best effort
+    and skipped instead, like any other failure.
+    """
+    try:
+        smtp_breaker.before_send()
+    except CircuitOpenError:
+        if fail_silently:
+            return 0
+        raise
+    try:
+        sent = send_mail(
+            subject=subject,
+            message=message,
+            from_email=from_email,
+            recipient_list=recipient_list,
+            fail_silently=False,
+            connection=connection,
+        )
+    except Exception as exc:
+        if is_relay_failure(exc):
+            smtp_breaker.record_failure()
+        if fail_silently:
+            return 0
+        raise
+    smtp_breaker.record_success()
+    return sent
+
+
+def backoff_countdown(retries):
+    """Exponential backoff with full jitter for the given retry number"""
+    ceiling = min(settings.SMTP_RETRY_BACKOFF_MAX, settings.SMTP_RETRY_BACKOFF_BASE * 2 ** retries)
+    return random.uniform(0, ceiling)
+
+
+class DeliveryTask(Task):
+    """Base class for tasks that send mail through ``deliver_mail``"""
+
+    def park(self, exc, args=None, kwargs=None):
+        """
+        Re-queue the task until the circuit may close, keeping its retry count
+
+        Parking is not a delivery attempt, so it does not use up
+        ``max_retries``. The jitter spreads parked tasks over the reset
+        window instead of releasing them all at once. ``args``/``kwargs``
+        replace the original arguments, e.g. to drop work already done.
+
+        The time of the first park travels in the ``parked_since`` header.
+        A task parked for longer than ``SMTP_PARK_MAX_AGE`` seconds is logged
+        and fails with ``exc`` instead of cycling for as long as the relay is
+        down.
+        """
+        if self.request.called_directly or self.request.is_eager:
+            raise exc
+        headers = self.request.headers or {}
+        parked_since = headers.get('parked_since') or time.time()
+        if time.time() - parked_since >= settings.SMTP_PARK_MAX_AGE:
+            print(
+                f"SMTP circuit open for {settings.SMTP_PARK_MAX_AGE}s. Giving up on {self.name}"
+                f"[{self.request.id}] args={args if args is not None else self.request.args}"
+            )
+            raise exc
+        countdown = exc.retry_after + random.uniform(0, smtp_breaker.reset_timeout)
+        signature = self.signature_from_request(
+            self.request, args=args, kwargs=kwargs, countdown=countdown, retries=self.request.retries,
+            headers={**headers, 'parked_since': parked_since},
+        )
+        signature.apply_async()
+        raise Retry(exc=exc, when=countdown, sig=signature)
+
+    def retry_with_backoff(self, exc, args=None, kwargs=None):
+        return self.retry(args=args, kwargs=kwargs, exc=exc, countdown=backoff_countdown(self.request.retries))
@@ -0,0 +1,232 @@
+"""
+Server-sent events stream for the staff dashboard
+
+Writes publish a small JSON event to a Redis pub/sub channel. Each ASGI
+process holds a single subscription to that channel and fans events out to
+every connected viewer, so one long-lived connection per viewer replaces
+polling ``GET /api/contact/``. The last ``EVENTS_BUFFER_SIZE`` events are kept
+in memory so a reconnecting browser can resume from ``Last-Event-ID``.
+"""
+import asyncio
+import json
+from collections import deque
+from importlib import import_module
+
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+
+from .redis_clients import get_client
+
+SEQUENCE_KEY_SUFFIX = ':seq'
+
+
+def _get_redis():
+    return get_client(settings.EVENTS_REDIS_URL, settings.EVENTS_REDIS_TIMEOUT)
+
+
+def publish_event(event_type, data):
+    """
+    Publish an event to every connected dashboard
+
+    Events get a cluster-wide sequence number from Redis, which becomes the
+    SSE event id. Publishing never fails the caller's request.
+    """
+    try:
+        client = _get_redis()
+        event_id = client.incr(settings.EVENTS_CHANNEL + SEQUENCE_KEY_SUFFIX)
+        payload = json.dumps({'id': event_id, 'type': event_type, 'data': data}, cls=DjangoJSONEncoder)
+        client.publish(settings.EVENTS_CHANNEL, payload)
+        return event_id
+    except Exception as e:
+        print(f"Redis error: {e}. Event {event_type} not published")
+        return None
+
+
+def format_event(event):
+    """Encode an event in the text/event-stream wire format"""
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['type']}\n"
+        f"data: {json.dumps(event['data'])}\n\n"
+    ).encode()
+
+
+class EventBroadcaster:
+    """Per-process Redis subscription fanned out to in-memory viewer queues"""
+
+    def __init__(self, buffer_size, queue_size):
+        self.buffer = deque(maxlen=buffer_size)
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self._listener = None
+
+    def subscribe(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def dispatch(self, event):
+        self.buffer.append(event)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Disconnect slow viewers; they resume from Last-Event-ID
+                self.unsubscribe(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    def replay(self, last_event_id, latest_event_id):
+        """
+        Return the buffered events after ``last_event_id``
+
+        Returns None when some of the missed events already fell out of the
+        buffer, in which case the viewer has to reload its data.
+        """
+        if latest_event_id is not None and last_event_id >= latest_event_id:
+            return []
+        if not self.buffer or self.buffer[0]['id'] > last_event_id + 1:
+            return None
+        return [event for event in self.buffer if event['id'] > last_event_id]
+
+    async def _listen(self):
+        while True:
+            client = redis.asyncio.Redis.from_url(settings.EVENTS_REDIS_URL)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.EVENTS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self.dispatch(json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis error: {e}. Resubscribing to {settings.EVENTS_CHANNEL}...")
+                await asyncio.sleep(settings.EVENTS_RECONNECT_SECONDS)
+            finally:
+                await client.aclose()
+
+
+broadcaster = EventBroadcaster(
+    buffer_size=settings.EVENTS_BUFFER_SIZE,
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+)
+
+
+@sync_to_async
+def _is_staff(cookies):
+    """Authenticate the viewer from the Django session cookie"""
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return False
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(request)
+    return user.is_active and user.is_staff
+
+
+async def _latest_event_id():
+    client = redis.asyncio.Redis.from_url(
+        settings.EVENTS_REDIS_URL,
+        socket_connect_timeout=settings.EVENTS_REDIS_TIMEOUT,
+        socket_timeout=settings.EVENTS_REDIS_TIMEOUT,
+    )
+    try:
+        return int(await client.get(settings.EVENTS_CHANNEL + SEQUENCE_KEY_SUFFIX) or 0)
+    except Exception:
+        return None
+    finally:
+        await client.aclose()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def event_stream(scope, receive, send):
+    """ASGI application serving the dashboard event stream"""
+    headers = dict(scope['headers'])
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+
+    if not await _is_staff(cookies):
+        await send({
+            'type': 'http.response.start',
+            'status': 403,
+            'headers': [(b'content-type', b'text/plain')],
+        })
+        await send({'type': 'http.response.body', 'body': b'Forbidden'})
+        return
+
+    # Subscribe before replaying so nothing published in between is lost
+    queue = broadcaster.subscribe()
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f"retry: {settings.EVENTS_RETRY_MILLISECONDS}\n\n".encode(),
+            'more_body': True,
+        })
+
+        last_event_id = 0
+        last_event_header = headers.get(b'last-event-id', b'').decode('latin-1')
+        if last_event_header.isdigit():
+            last_event_id = int(last_event_header)
+            missed = broadcaster.replay(last_event_id, await _latest_event_id())
+            if missed is None:
+                await send({
+                    'type': 'http.response.body',
+                    'body': b"event: reset\ndata: {}\n\n",
+                    'more_body': True,
+                })
+                missed = []
+            for event in missed:
+                await send({'type': 'http.response.body', 'body': format_event(event), 'more_body': True})
+                last_event_id = event['id']
+
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        while True:
+            next_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {disconnected, next_event},
+                timeout=settings.EVENTS_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                next_event.cancel()
+                break
+            if not done:
+                next_event.cancel()
+                await send({'type': 'http.response.body', 'body': b": keepalive\n\n", 'more_body': True})
+                continue
+
+            event = next_event.result()
+            if event is None:
+                break
+            if event['id'] > last_event_id:
+                await send({'type': 'http.response.body', 'body': format_event(event), 'more_body': True})
+                last_event_id = event['id']
+
+        if not disconnected.done():
+            disconnected.cancel()
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,49 @@
+"""
+Email backend for measuring SMTP sessions without a relay
+
+``SimulatedSMTPBackend`` stores messages in ``django.core.mail.outbox`` like
+the locmem backend, but follows the SMTP backend's connection lifecycle:
+``send_messages`` opens a session unless the backend is already open and
+closes it afterwards. Used by the tests and ``benchmark_mail_batching`` to
+show how many sessions a task opens.
+"""
+import time
+
+from django.core.mail.backends.locmem import EmailBackend
+
+
+class SimulatedSMTPBackend(EmailBackend):
+    """
+    locmem delivery with SMTP sessions
+
+    Each new session is counted in ``sessions_opened`` and takes
+    ``connect_seconds``, standing in for the TCP/TLS handshake and the SMTP
+    greeting and login.
+    """
+    sessions_opened = 0
+    connect_seconds = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection = None
+
+    def open(self):
+        if self.connection:
+            return False
+        time.sleep(self.connect_seconds)
+        type(self).sessions_opened += 1
+        self.connection = True
+        return True
+
+    def close(self):
+        self.connection = None
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        new_session = self.open()
+        try:
+            return super().send_messages(email_messages)
+        finally:
+            if new_session:
+                self.close()
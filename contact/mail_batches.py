@@ -0,0 +1,89 @@
+"""
+Batched notification emails for new contact messages and calls
+
+With ``MAIL_BATCH_ENABLED`` on, a new record does not get its own mail task.
+Its id is pushed onto a Redis list for its batch, and the first id of a window
+queues one batch task ``MAIL_BATCH_WINDOW_MS`` later. Once ``MAIL_BATCH_SIZE``
+ids are waiting, a batch task is queued straight away. The batch task takes up
+to ``MAIL_BATCH_SIZE`` ids, loads the records with one query and sends every
+email over one SMTP connection.
+
+When Redis cannot buffer the id, the record gets its per-record task instead,
+with the task spool as usual. Taken ids only live in the batch task from then
+on: retries and parking carry them, but a worker killed while sending loses
+the unsent part of that batch. Per-record mode, the default, has no such
+window.
+"""
+from django.conf import settings
+
+from .redis_clients import get_client
+from .spool import apply_or_spool, enqueue
+
+# Per-record and batch task of each batch, looked up lazily since the tasks
+# module imports this one
+BATCH_TASKS = {
+    'contact': ('send_contact_email', 'send_contact_email_batch'),
+    'call': ('send_call_schedule_email', 'send_call_schedule_email_batch'),
+}
+# The batch task clears the flag when it runs; the TTL only matters if that
+# task is lost, so the next id schedules a new one
+FLUSH_FLAG_TTL = 60
+
+
+def _get_redis():
+    return get_client(settings.CELERY_BROKER_URL, settings.MAIL_BATCH_REDIS_TIMEOUT)
+
+
+def _key(batch_name):
+    return f'{settings.MAIL_BATCH_KEY_PREFIX}:{batch_name}'
+
+
+def _task(batch_name, batch=False):
+    from . import tasks
+    return getattr(tasks, BATCH_TASKS[batch_name][1 if batch else 0])
+
+
+def add(batch_name, record_id):
+    """Buffer a record id, queueing the batch task that will send it if needed"""
+    key = _key(batch_name)
+    client = _get_redis()
+    pipe = client.pipeline()
+    pipe.rpush(key, record_id)
+    pipe.set(f'{key}:flush', 1, nx=True, ex=FLUSH_FLAG_TTL)
+    waiting, first = pipe.execute()
+
+    try:
+        if first:
+            apply_or_spool(_task(batch_name, batch=True), countdown=settings.MAIL_BATCH_WINDOW_MS / 1000)
+        elif waiting == settings.MAIL_BATCH_SIZE:
+            apply_or_spool(_task(batch_name, batch=True))
+    except Exception:
+        # Nothing will send the buffered id; hand it back to the caller
+        client.lrem(key, 1, record_id)
+        client.delete(f'{key}:flush')
+        raise
+
+
+def take(batch_name):
+    """Pop the next batch of ids, queueing another batch task if more are waiting"""
+    key = _key(batch_name)
+    pipe = _get_redis().pipeline()
+    pipe.delete(f'{key}:flush')
+    pipe.lpop(key, settings.MAIL_BATCH_SIZE)
+    pipe.llen(key)
+    _, record_ids, waiting = pipe.execute()
+
+    if waiting:
+        apply_or_spool(_task(batch_name, batch=True))
+    return [int(record_id) for record_id in record_ids or []]
+
+
+def enqueue_mail(batch_name, record_id):
+    """Queue the notification emails of a new record, batched when enabled"""
+    if settings.MAIL_BATCH_ENABLED:
+        try:
+            add(batch_name, record_id)
+            return
+        except Exception as e:
+            print(f"Redis error: {e}. Queueing emails for {batch_name} {record_id} on their own...")
+    enqueue(_task(batch_name), record_id)
@@ -0,0 +1,111 @@
+import time
+from datetime import date, time as dt_time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from contact.models import CallSchedule
+from contact.serializers import CallScheduleSerializer
+from portfolio_backend.compression import CompressionMiddleware
+
+STREAM_CHUNK_SIZE = 8 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Measure bytes on the wire and CPU per request for each response encoding'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=200,
+            help='Number of call schedules in the benchmarked list response',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Requests per encoding',
+        )
+
+    def handle(self, *args, **options):
+        body = self.list_body(options['rows'])
+        middleware = CompressionMiddleware(lambda request: None)
+        encodings = ['identity', *middleware.encodings]
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"GET /api/schedule-call/ with {options['rows']} rows ({len(body)} bytes)"
+        ))
+        self.stdout.write(f"  {'encoding':<10}{'buffered':>12}{'ratio':>8}{'CPU/req':>11}{'streamed':>12}{'CPU/req':>11}")
+        for encoding in encodings:
+            buffered_size, buffered_cpu = self.measure(middleware, encoding, body, options['iterations'], False)
+            streamed_size, streamed_cpu = self.measure(middleware, encoding, body, options['iterations'], True)
+            self.stdout.write(
+                f'  {encoding:<10}{buffered_size:>12}{buffered_size / len(body):>8.1%}'
+                f'{buffered_cpu * 1000:>9.2f}ms{streamed_size:>12}{streamed_cpu * 1000:>9.2f}ms'
+            )
+
+        self.static_report()
+
+    def list_body(self, rows):
+        call_schedules = [
+            CallSchedule(
+                id=index,
+                name=f'Caller {index}',
+                email=f'caller{index}@example.com',
+                phone='+1234567890',
+                preferred_date=date.today() + timedelta(days=2 + index % 30),
+                preferred_time=dt_time(14, 0),
+                timezone='America/New_York',
+                topic='Project Discussion',
+                message="I'd like to discuss my project requirements.",
+            )
+            for index in range(rows)
+        ]
+        return JSONRenderer().render(CallScheduleSerializer(call_schedules, many=True).data)
+
+    def measure(self, middleware, encoding, body, iterations, streaming):
+        """Average size and CPU seconds of compressing ``body`` as one response"""
+        request = RequestFactory().get('/api/schedule-call/', HTTP_ACCEPT_ENCODING=encoding)
+        chunks = [body[offset:offset + STREAM_CHUNK_SIZE] for offset in range(0, len(body), STREAM_CHUNK_SIZE)]
+        size = 0
+        cpu = 0.0
+        for _ in range(iterations):
+            if streaming:
+                response = StreamingHttpResponse(iter(chunks), content_type='application/json')
+            else:
+                response = HttpResponse(body, content_type='application/json')
+            started = time.process_time()
+            response = middleware.compress(request, response)
+            content = b''.join(response.streaming_content) if streaming else response.content
+            cpu += time.process_time() - started
+            size = len(content)
+        return size, cpu / iterations
+
+    def static_report(self):
+        static_root = Path(settings.STATIC_ROOT)
+        originals = [
+            path for path in static_root.rglob('*')
+            if path.is_file() and path.suffix not in ('.gz', '.br') and path.with_name(path.name + '.gz').exists()
+        ] if static_root.is_dir() else []
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Static files in {static_root}'))
+        if not originals:
+            self.stdout.write('  No precompressed files, run "python manage.py collectstatic" first')
+            return
+
+        total = sum(path.stat().st_size for path in originals)
+        self.stdout.write(f'  {len(originals)} compressible files, {total} bytes')
+        for suffix, encoding in (('.gz', 'gzip'), ('.br', 'br')):
+            compressed = [path.with_name(path.name + suffix) for path in originals]
+            compressed_total = sum(
+                path.stat().st_size if path.exists() else original.stat().st_size
+                for path, original in zip(compressed, originals)
+            )
+            self.stdout.write(
+                f'  {encoding:<10}{compressed_total:>12}{compressed_total / total:>8.1%}'
+                f'  (precompressed, no CPU per request)'
+            )
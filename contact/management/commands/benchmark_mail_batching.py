@@ -0,0 +1,82 @@
+import time
+
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from contact.mail_backends import SimulatedSMTPBackend
+from contact.models import ContactMessage
+from contact.tasks import send_contact_email, send_contact_email_batch
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare one mail task per contact message with batched mail tasks, with simulated SMTP sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--records',
+            type=int,
+            default=500,
+            help='Number of contact messages to send notifications for',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Records per batch task',
+        )
+        parser.add_argument(
+            '--connect-ms',
+            type=float,
+            default=30,
+            help='Simulated cost of opening an SMTP session (handshake, TLS, login)',
+        )
+
+    def handle(self, *args, **options):
+        SimulatedSMTPBackend.connect_seconds = options['connect_ms'] / 1000
+        try:
+            with override_settings(EMAIL_BACKEND='contact.mail_backends.SimulatedSMTPBackend'), \
+                    transaction.atomic():
+                record_ids = [
+                    message.id for message in ContactMessage.objects.bulk_create(
+                        ContactMessage(name=f'Visitor {index}', email=f'visitor{index}@example.com',
+                                       message='Benchmark message body.')
+                        for index in range(options['records'])
+                    )
+                ]
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"Notifications for {len(record_ids)} contact messages (tasks run in process, "
+                    f"broker round trips excluded, {options['connect_ms']:g} ms per SMTP session)"
+                ))
+                self.stdout.write(
+                    f"  {'mode':<12}{'tasks':>8}{'queries':>10}{'sessions':>10}{'emails':>9}{'seconds':>10}{'records/s':>12}"
+                )
+                self.report('per-record', record_ids, [(send_contact_email, [record_id]) for record_id in record_ids])
+                batch_size = options['batch_size']
+                self.report(f'batch of {batch_size}', record_ids, [
+                    (send_contact_email_batch, [record_ids[offset:offset + batch_size]])
+                    for offset in range(0, len(record_ids), batch_size)
+                ])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            SimulatedSMTPBackend.connect_seconds = 0.0
+
+    def report(self, mode, record_ids, calls):
+        mail.outbox = []
+        SimulatedSMTPBackend.sessions_opened = 0
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for task, args in calls:
+                task.apply(args=args)
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  {mode:<12}{len(calls):>8}{len(queries):>10}{SimulatedSMTPBackend.sessions_opened:>10}{len(mail.outbox):>9}'
+            f'{elapsed:>10.3f}{len(record_ids) / elapsed:>12.0f}'
+        )
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from contact.uploads import delete_orphaned_files
+
+
+class Command(BaseCommand):
+    help = 'Delete stored attachment files no attachment refers to, and abandoned temporary uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=1,
+            help='Only delete files older than this many hours',
+        )
+
+    def handle(self, *args, **options):
+        stored_files, temp_files = delete_orphaned_files(grace=timedelta(hours=options['grace_hours']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {stored_files} unreferenced stored files and {temp_files} temporary uploads'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from contact import spool
+
+
+class Command(BaseCommand):
+    help = 'Replay tasks spooled while the Celery broker was unreachable'
+
+    def handle(self, *args, **options):
+        if not spool.pending():
+            self.stdout.write('Task spool is empty')
+            return
+
+        published = spool.drain()
+        if published is None:
+            self.stdout.write('Another process is draining the task spool')
+        elif spool.pending():
+            self.stdout.write(self.style.WARNING(f'Replayed {published} tasks, broker still unreachable'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Replayed {published} tasks'))
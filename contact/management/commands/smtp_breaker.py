@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.delivery import smtp_breaker
+
+
+class Command(BaseCommand):
+    help = 'Show the SMTP circuit breaker state and delivery metrics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Close the circuit and clear the delivery counters',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['reset']:
+                smtp_breaker.reset()
+                self.stdout.write(self.style.SUCCESS('SMTP circuit breaker reset'))
+            metrics = smtp_breaker.metrics()
+        except Exception as e:
+            raise CommandError(f'Could not reach Redis: {e}')
+
+        for name, value in metrics.items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+ROLE_SETTINGS = {
+    'all': 'portfolio_backend.settings',
+    'web': 'portfolio_backend.settings_web',
+    'worker': 'portfolio_backend.settings_worker',
+    'beat': 'portfolio_backend.settings_beat',
+}
+
+# What each role does before it can serve its first request or task
+ROLE_STARTUP = {
+    'all': 'import portfolio_backend.wsgi, portfolio_backend.urls',
+    'web': 'import portfolio_backend.wsgi, portfolio_backend.urls',
+    'worker': (
+        'from portfolio_backend.celery_app import app; '
+        'app.loader.import_default_modules(); app.finalize()'
+    ),
+    'beat': (
+        'from portfolio_backend.celery_app import app; '
+        'import django_celery_beat.schedulers'
+    ),
+}
+
+# ru_maxrss survives exec and would report this command's own peak, so the
+# resident set is read from /proc where available
+PROBE = """
+import resource, time
+started = time.perf_counter()
+import django
+django.setup()
+{startup}
+elapsed = time.perf_counter() - started
+try:
+    with open('/proc/self/status') as status:
+        rss_kb = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(f"{{elapsed}} {{rss_kb}}")
+"""
+
+
+class Command(BaseCommand):
+    help = 'Print an import-time breakdown of process startup for each settings profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--role',
+            choices=sorted(ROLE_SETTINGS),
+            action='append',
+            help='Profile to measure (repeatable, default: all of them)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of top-level packages to list per profile',
+        )
+
+    def handle(self, *args, **options):
+        for role in options['role'] or ['all', 'web', 'worker', 'beat']:
+            self.profile(role, options['top'])
+
+    def profile(self, role, top):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': ROLE_SETTINGS[role]}
+        # A fresh interpreter, so nothing is already imported
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE.format(startup=ROLE_STARTUP[role])],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'{role} startup failed:\n{result.stderr[-2000:]}')
+
+        elapsed, rss_kb = result.stdout.split()[-2:]
+        by_package = Counter()
+        modules = 0
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, _, name = line.split(':', 1)[1].split('|')
+            by_package[name.strip().split('.')[0]] += int(self_us)
+            modules += 1
+
+        total_ms = sum(by_package.values()) / 1000
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{role} ({ROLE_SETTINGS[role]})'))
+        self.stdout.write(
+            f'  startup {float(elapsed) * 1000:.0f} ms, imports {total_ms:.0f} ms '
+            f'across {modules} modules, RSS {int(rss_kb) / 1024:.1f} MiB'
+        )
+        for package, self_us in by_package.most_common(top):
+            self.stdout.write(f'  {self_us / 1000:8.1f} ms  {self_us / 10 / total_ms:5.1f}%  {package}')
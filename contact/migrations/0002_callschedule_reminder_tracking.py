@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callschedule',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callschedule',
+            name='reminder_task_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
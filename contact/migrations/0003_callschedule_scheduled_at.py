@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0002_callschedule_reminder_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callschedule',
+            name='scheduled_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+    ]
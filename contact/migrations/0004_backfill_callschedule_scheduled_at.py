@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+from contact.utils import resolve_timezone
+
+BATCH_SIZE = 500
+
+
+def backfill_scheduled_at(apps, schema_editor):
+    CallSchedule = apps.get_model('contact', 'CallSchedule')
+    queryset = CallSchedule.objects.filter(scheduled_at__isnull=True).order_by('pk').only(
+        'pk', 'preferred_date', 'preferred_time', 'timezone'
+    )
+
+    # Walk the table by primary key so memory stays flat on large tables
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for call_schedule in batch:
+            call_schedule.scheduled_at = datetime.combine(
+                call_schedule.preferred_date,
+                call_schedule.preferred_time,
+                tzinfo=resolve_timezone(call_schedule.timezone),
+            ).astimezone(timezone.utc)
+        CallSchedule.objects.bulk_update(batch, ['scheduled_at'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0003_callschedule_scheduled_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_scheduled_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0004_backfill_callschedule_scheduled_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='callschedule',
+            options={'ordering': ['scheduled_at'], 'verbose_name': 'Call Schedule', 'verbose_name_plural': 'Call Schedules'},
+        ),
+    ]
@@ -1,6 +1,10 @@
+from datetime import datetime, timezone as dt_timezone
+
 from django.db import models
 from django.utils import timezone
 
+from .utils import resolve_timezone
+
 
 class ContactMessage(models.Model):
     """Model for storing contact form submissions"""
@@ -40,21 +44,74 @@ class CallSchedule(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized UTC instant of preferred_date/preferred_time in timezone,
+    # kept in sync on save so queries can range-scan the real call time
+    scheduled_at = models.DateTimeField(null=True, editable=False, db_index=True)
+    reminder_task_id = models.CharField(max_length=255, blank=True)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
-        ordering = ['preferred_date', 'preferred_time']
+        ordering = ['scheduled_at']
         verbose_name = 'Call Schedule'
         verbose_name_plural = 'Call Schedules'
     
     def __str__(self):
         return f"{self.name} - {self.preferred_date} {self.preferred_time} ({self.status})"
     
+    def save(self, *args, **kwargs):
+        self.scheduled_at = self.call_datetime.astimezone(dt_timezone.utc)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'preferred_date', 'preferred_time', 'timezone'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'scheduled_at'}
+        super().save(*args, **kwargs)
+    
+    @property
+    def call_datetime(self):
+        """Scheduled call time as an aware datetime in the caller's timezone"""
+        return datetime.combine(
+            self.preferred_date, self.preferred_time,
+            tzinfo=resolve_timezone(self.timezone),
+        )
+    
     @property
     def is_upcoming(self):
         """Check if the call is in the future"""
-        from datetime import datetime, time
-        now = timezone.now()
-        call_datetime = timezone.make_aware(
-            datetime.combine(self.preferred_date, self.preferred_time)
-        )
-        return call_datetime > now and self.status != 'cancelled'
+        scheduled_at = self.scheduled_at or self.call_datetime
+        return scheduled_at > timezone.now() and self.status != 'cancelled'
+
+
+class StoredFile(models.Model):
+    """Attachment content, stored once per distinct SHA-256"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Stored File'
+        verbose_name_plural = 'Stored Files'
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes)"
+
+
+class Attachment(models.Model):
+    """A file attached to a contact message or a call schedule"""
+    file = models.ForeignKey(StoredFile, on_delete=models.PROTECT, related_name='attachments')
+    original_name = models.CharField(max_length=255)
+    contact_message = models.ForeignKey(
+        ContactMessage, null=True, blank=True, on_delete=models.CASCADE, related_name='attachments'
+    )
+    call_schedule = models.ForeignKey(
+        CallSchedule, null=True, blank=True, on_delete=models.CASCADE, related_name='attachments'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Attachment'
+        verbose_name_plural = 'Attachments'
+    
+    def __str__(self):
+        return self.original_name
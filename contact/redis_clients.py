@@ -0,0 +1,31 @@
+"""
+Shared synchronous Redis clients
+
+The breaker, batching, spool, events, health and autoscale code each talk to
+Redis with their own short timeout. ``get_client`` creates one client per
+``(url, timeout, decode_responses)`` on first use and returns it from then
+on, so callers share its connection pool and nothing connects at import time.
+"""
+import threading
+
+import redis
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url, timeout, decode_responses=False):
+    """Return the shared client for ``url`` with ``timeout`` second socket timeouts"""
+    key = (url, timeout, decode_responses)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = redis.Redis.from_url(
+                    url,
+                    socket_connect_timeout=timeout,
+                    socket_timeout=timeout,
+                    decode_responses=decode_responses,
+                )
+    return client
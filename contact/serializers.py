@@ -1,9 +1,36 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import ContactMessage, CallSchedule
-from datetime import datetime, date
+from .models import ContactMessage, CallSchedule, Attachment
+from .utils import resolve_timezone, timezone_names
+from datetime import datetime
 
 
-class ContactMessageSerializer(serializers.ModelSerializer):
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin that keeps only the fields named in ``fields``
+    
+    ``Meta.field_dependencies`` lists the model fields a computed field
+    reads, so views can load just those columns with ``.only()``.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    @classmethod
+    def get_model_fields(cls, fields):
+        """Model fields that must be loaded to serialize ``fields``"""
+        dependencies = getattr(cls.Meta, 'field_dependencies', {})
+        model_fields = []
+        for name in fields:
+            model_fields.extend(dependencies.get(name, [name]))
+        return model_fields
+
+
+class ContactMessageSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for contact messages"""
     
     class Meta:
@@ -30,7 +57,7 @@ class ContactMessageSerializer(serializers.ModelSerializer):
         return value.strip()
 
 
-class CallScheduleSerializer(serializers.ModelSerializer):
+class CallScheduleSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for call scheduling"""
     is_upcoming = serializers.ReadOnlyField()
     
@@ -42,6 +69,7 @@ class CallScheduleSerializer(serializers.ModelSerializer):
             'status', 'created_at', 'updated_at', 'is_upcoming'
         ]
         read_only_fields = ['id', 'status', 'created_at', 'updated_at', 'is_upcoming']
+        field_dependencies = {'is_upcoming': ['scheduled_at', 'status']}
     
     def validate_email(self, value):
         """Validate email format"""
@@ -59,22 +87,28 @@ class CallScheduleSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Phone number must be at least 10 digits.")
         return value
     
-    def validate_preferred_date(self, value):
-        """Validate that the date is not in the past"""
-        if value < date.today():
-            raise serializers.ValidationError("Cannot schedule a call in the past.")
+    def validate_timezone(self, value):
+        """Validate that the timezone is a known IANA name"""
+        value = value.strip()
+        if value not in timezone_names():
+            raise serializers.ValidationError(
+                f'Unknown timezone "{value}". Use an IANA name such as "America/New_York".'
+            )
         return value
     
     def validate(self, data):
         """Cross-field validation"""
-        preferred_date = data.get('preferred_date')
-        preferred_time = data.get('preferred_time')
+        preferred_date = data.get('preferred_date', getattr(self.instance, 'preferred_date', None))
+        preferred_time = data.get('preferred_time', getattr(self.instance, 'preferred_time', None))
+        call_timezone = data.get('timezone', getattr(self.instance, 'timezone', 'UTC'))
+        rescheduling = {'preferred_date', 'preferred_time', 'timezone'} & set(data)
         
-        if preferred_date and preferred_time:
-            # Check if datetime is in the past
+        if preferred_date and preferred_time and rescheduling:
+            # Check if datetime is in the past, in the caller's timezone (the
+            # caller's "today" can differ from the server's UTC date)
             from django.utils import timezone
-            call_datetime = timezone.make_aware(
-                datetime.combine(preferred_date, preferred_time)
+            call_datetime = datetime.combine(
+                preferred_date, preferred_time, tzinfo=resolve_timezone(call_timezone)
             )
             if call_datetime < timezone.now():
                 raise serializers.ValidationError(
@@ -82,3 +116,38 @@ class CallScheduleSerializer(serializers.ModelSerializer):
                 )
         
         return data
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    """Serializer for attachment metadata"""
+    sha256 = serializers.CharField(source='file.sha256', read_only=True)
+    size = serializers.IntegerField(source='file.size', read_only=True)
+    content_type = serializers.CharField(source='file.content_type', read_only=True)
+    
+    class Meta:
+        model = Attachment
+        fields = [
+            'id', 'original_name', 'sha256', 'size', 'content_type',
+            'contact_message', 'call_schedule', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class BulkCallStatusSerializer(serializers.Serializer):
+    """Input for moving many calls to one status"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_IDS,
+    )
+    status = serializers.ChoiceField(choices=CallSchedule.STATUS_CHOICES)
+
+
+class BulkReadSerializer(serializers.Serializer):
+    """Input for marking many contact messages as read or unread"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_IDS,
+    )
+    is_read = serializers.BooleanField(default=True)
@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ContactMessage, CallSchedule
+
+
+# Serializers and the Redis publisher are imported on first use so processes
+# that never save these models (Celery workers, beat) do not load DRF or Redis
+
+
+@receiver(post_save, sender=ContactMessage)
+def publish_contact_message(sender, instance, created, **kwargs):
+    """Push contact message changes to the dashboard event stream"""
+    from .events import publish_event
+    from .serializers import ContactMessageSerializer
+    
+    event_type = 'contact.created' if created else 'contact.updated'
+    data = ContactMessageSerializer(instance).data
+    transaction.on_commit(lambda: publish_event(event_type, data))
+
+
+@receiver(post_save, sender=CallSchedule)
+def publish_call_schedule(sender, instance, created, **kwargs):
+    """Push call schedule changes to the dashboard event stream"""
+    from .events import publish_event
+    from .serializers import CallScheduleSerializer
+    
+    event_type = 'call.created' if created else 'call.updated'
+    data = CallScheduleSerializer(instance).data
+    transaction.on_commit(lambda: publish_event(event_type, data))
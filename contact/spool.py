@@ -0,0 +1,266 @@
+"""
+Local durable spool for Celery tasks while the broker is unreachable
+
+When publishing a task fails, the request appends it to an append-only spool
+file instead of doing the work inline. Each record is a 4-byte marker, the
+payload length and its CRC-32 (big-endian), followed by the JSON payload, and
+every append is fsync'd before the request returns. A process that dies
+mid-append leaves a torn record; the next append goes after it, so readers
+skip anything that fails its checksum and resume at the next marker. The
+marker starts with 0xFF, which never occurs in the ASCII JSON payloads. A background drainer replays the spool into Celery once the
+broker is back. Delivery is at least once: every record keeps its task id,
+and the drainer skips ids it has already published.
+
+Files in ``TASK_SPOOL_DIR``:
+
+- ``tasks.spool``: appended to by requests
+- ``tasks.draining``: the spool being replayed, renamed from ``tasks.spool``
+- ``tasks.checkpoint``: byte offset of the first record not yet replayed
+- ``append.lock`` / ``drain.lock``: flock files shared by all processes
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from celery import current_app
+from django.conf import settings
+
+from .redis_clients import get_client
+
+MAGIC = b'\xffTSP'
+HEADER = struct.Struct('>4sII')
+CHECKPOINT = struct.Struct('>Q')
+
+_connection_pool = None
+_drainer = None
+_drainer_lock = threading.Lock()
+
+
+def _get_redis():
+    return get_client(settings.CELERY_BROKER_URL, settings.TASK_SPOOL_REDIS_TIMEOUT)
+
+
+def _get_connection_pool():
+    """
+    Broker connections that give up after one failed connect
+
+    Kombu otherwise sleeps between reconnect attempts before raising, even
+    when publishing with ``retry=False``. Workers keep the default pool.
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        transport_options = {**current_app.conf.broker_transport_options, 'max_retries': 0}
+        _connection_pool = current_app.connection_for_write(
+            transport_options=transport_options,
+        ).Pool(limit=current_app.conf.broker_pool_limit)
+    return _connection_pool
+
+
+def _path(name):
+    return Path(settings.TASK_SPOOL_DIR) / name
+
+
+@contextmanager
+def _flock(name, blocking=True):
+    Path(settings.TASK_SPOOL_DIR).mkdir(parents=True, exist_ok=True)
+    with open(_path(name), 'a') as lock_file:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _frame(payload):
+    return HEADER.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+
+def append(task_name, args=(), kwargs=None, options=None):
+    """Durably append a task to the spool and return its task id"""
+    record = {
+        'id': str(uuid.uuid4()),
+        'task': task_name,
+        'args': list(args),
+        'kwargs': kwargs or {},
+        'options': options or {},
+    }
+    payload = json.dumps(record).encode()
+    with _flock('append.lock'):
+        fd = os.open(_path('tasks.spool'), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, _frame(payload))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return record['id']
+
+
+def pending():
+    """Whether there is anything left to replay (a single stat per file)"""
+    return _path('tasks.spool').exists() or _path('tasks.draining').exists()
+
+
+def read_records(path, offset=0):
+    """
+    Yield ``(record, end_offset)`` for every intact record after ``offset``
+
+    Torn or corrupt bytes (from a crash mid-append; that request never
+    returned) are logged and skipped up to the next record marker, so the
+    records appended after them are still replayed.
+    """
+    with open(path, 'rb') as spool_file:
+        if os.fstat(spool_file.fileno()).st_size <= offset:
+            return
+        with mmap.mmap(spool_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            while offset + HEADER.size <= len(data):
+                magic, length, checksum = HEADER.unpack_from(data, offset)
+                start, end = offset + HEADER.size, offset + HEADER.size + length
+                if magic == MAGIC and end <= len(data) and zlib.crc32(data[start:end]) == checksum:
+                    try:
+                        record = json.loads(data[start:end])
+                    except ValueError as e:
+                        print(f"Task spool error: {e}. Skipping unreadable record at offset {offset} in {path}")
+                    else:
+                        yield record, end
+                    offset = end
+                    continue
+
+                next_offset = data.find(MAGIC, offset + 1)
+                if next_offset == -1:
+                    return
+                print(f"Task spool error: skipping {next_offset - offset} torn bytes at offset {offset} in {path}")
+                offset = next_offset
+
+
+def _read_checkpoint():
+    try:
+        return CHECKPOINT.unpack(_path('tasks.checkpoint').read_bytes())[0]
+    except (FileNotFoundError, struct.error):
+        return 0
+
+
+def _write_checkpoint(offset):
+    fd = os.open(_path('tasks.checkpoint'), os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, CHECKPOINT.pack(offset))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _publish(record):
+    """Send one record to Celery unless an earlier drain already did"""
+    dedup_key = f"{settings.TASK_SPOOL_DEDUP_PREFIX}:{record['id']}"
+    client = _get_redis()
+    if client.exists(dedup_key):
+        return False
+    with _get_connection_pool().acquire(block=True) as connection:
+        current_app.send_task(
+            record['task'],
+            args=record['args'],
+            kwargs=record['kwargs'],
+            task_id=record['id'],
+            connection=connection,
+            retry=False,
+            ignore_result=True,
+            **record['options'],
+        )
+    client.set(dedup_key, 1, ex=settings.TASK_SPOOL_DEDUP_TTL)
+    return True
+
+
+def drain():
+    """
+    Replay spooled tasks into Celery
+
+    Returns the number of tasks published, or None if another process is
+    already draining. Stops at the first publish failure and resumes from the
+    checkpoint on the next call.
+    """
+    with _flock('drain.lock', blocking=False) as acquired:
+        if not acquired:
+            return None
+
+        published = 0
+        while True:
+            if not _path('tasks.draining').exists():
+                # New appends go to a fresh spool while this one is replayed
+                with _flock('append.lock'):
+                    if not _path('tasks.spool').exists():
+                        return published
+                    _path('tasks.checkpoint').unlink(missing_ok=True)
+                    os.rename(_path('tasks.spool'), _path('tasks.draining'))
+
+            for record, offset in read_records(_path('tasks.draining'), _read_checkpoint()):
+                try:
+                    published += _publish(record)
+                except Exception as e:
+                    print(f"Celery error: {e}. {published} spooled tasks replayed, retrying later...")
+                    return published
+                _write_checkpoint(offset)
+
+            _path('tasks.draining').unlink()
+            _path('tasks.checkpoint').unlink(missing_ok=True)
+
+
+def _drain_until_empty():
+    while pending():
+        time.sleep(settings.TASK_SPOOL_DRAIN_INTERVAL)
+        try:
+            drain()
+        except Exception as e:
+            # Keep the drainer alive; the next interval retries from the checkpoint
+            print(f"Task spool error: {e}. Draining again in {settings.TASK_SPOOL_DRAIN_INTERVAL}s...")
+
+
+def ensure_drainer():
+    """Start this process's background drainer if the spool has work"""
+    global _drainer
+    if not pending():
+        return
+    with _drainer_lock:
+        if _drainer is None or not _drainer.is_alive():
+            _drainer = threading.Thread(target=_drain_until_empty, name='task-spool-drainer', daemon=True)
+            _drainer.start()
+
+
+def enqueue(task, *args, **kwargs):
+    """
+    Publish a task, falling back to the spool when the broker is down
+
+    Publishing does not retry and does not subscribe to the result backend
+    (nothing on the request path reads results), so a dead broker costs one
+    failed connection attempt instead of blocking the request.
+    """
+    return apply_or_spool(task, args, kwargs)
+
+
+def apply_or_spool(task, args=(), kwargs=None, **options):
+    """``enqueue`` with Celery publishing options such as ``countdown``"""
+    try:
+        with _get_connection_pool().acquire(block=True) as connection:
+            result = task.apply_async(
+                args=args, kwargs=kwargs, connection=connection, retry=False, ignore_result=True, **options,
+            )
+    except Exception as e:
+        if not settings.TASK_SPOOL_ENABLED:
+            raise
+        print(f"Celery error: {e}. Spooling {task.name} locally...")
+        task_id = append(task.name, args, kwargs, options)
+        ensure_drainer()
+        return task_id
+    ensure_drainer()
+    return result.id
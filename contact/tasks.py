@@ -1,21 +1,22 @@
-from celery import shared_task
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.template.loader import render_to_string
+from datetime import timedelta
+
+from celery import current_app, shared_task
 from django.conf import settings
+from django.core.mail import get_connection
+from django.utils import timezone
+from . import mail_batches
+from .delivery import CircuitOpenError, DeliveryTask, deliver_mail, open_connection, smtp_breaker
 from .models import ContactMessage, CallSchedule
+from .spool import apply_or_spool, enqueue
 
+ACTIVE_CALL_STATUSES = ['pending', 'confirmed']
 
-@shared_task(bind=True, max_retries=3)
-def send_contact_email(self, contact_message_id):
-    """
-    Celery task to send email notifications for contact form submissions
-    """
-    try:
-        contact_message = ContactMessage.objects.get(id=contact_message_id)
-        
-        # Email to admin
-        admin_subject = f'New Contact Message from {contact_message.name}'
-        admin_message = f"""
+
+def contact_message_emails(contact_message):
+    """Admin notification and confirmation emails for a contact message"""
+    # Email to admin
+    admin_subject = f'New Contact Message from {contact_message.name}'
+    admin_message = f"""
 New contact form submission:
 
 Name: {contact_message.name}
@@ -29,19 +30,11 @@ Message:
 Received at: {contact_message.created_at.strftime('%Y-%m-%d %H:%M:%S')}
 
 Reply to: {contact_message.email}
-        """
-        
-        send_mail(
-            subject=admin_subject,
-            message=admin_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.ADMIN_EMAIL],
-            fail_silently=False,
-        )
-        
-        # Confirmation email to user
-        user_subject = 'Thank you for contacting me!'
-        user_message = f"""
+    """
+    
+    # Confirmation email to user
+    user_subject = 'Thank you for contacting me!'
+    user_message = f"""
 Hi {contact_message.name},
 
 Thank you for reaching out! I have received your message and will get back to you as soon as possible.
@@ -57,36 +50,53 @@ Full Stack Software Engineer
 
 ---
 This is an automated confirmation email.
-        """
+    """
+    
+    return [
+        {
+            'subject': admin_subject,
+            'message': admin_message,
+            'recipient_list': [settings.ADMIN_EMAIL],
+            'fail_silently': False,
+        },
+        {
+            'subject': user_subject,
+            'message': user_message,
+            'recipient_list': [contact_message.email],
+            'fail_silently': True,
+        },
+    ]
+
+
+@shared_task(bind=True, base=DeliveryTask, max_retries=3)
+def send_contact_email(self, contact_message_id):
+    """
+    Celery task to send email notifications for contact form submissions
+    """
+    try:
+        smtp_breaker.raise_if_open()
+        contact_message = ContactMessage.objects.get(id=contact_message_id)
         
-        send_mail(
-            subject=user_subject,
-            message=user_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[contact_message.email],
-            fail_silently=True,
-        )
+        for email in contact_message_emails(contact_message):
+            deliver_mail(from_email=settings.DEFAULT_FROM_EMAIL, **email)
         
         return f"Email sent successfully for contact message {contact_message_id}"
         
     except ContactMessage.DoesNotExist:
         return f"Contact message {contact_message_id} not found"
+    except CircuitOpenError as exc:
+        # The relay is down; wait for the circuit instead of adding load
+        self.park(exc)
     except Exception as exc:
         # Retry the task if it fails
-        raise self.retry(exc=exc, countdown=60)
+        raise self.retry_with_backoff(exc)
 
 
-@shared_task(bind=True, max_retries=3)
-def send_call_schedule_email(self, call_schedule_id):
-    """
-    Celery task to send email notifications for call scheduling
-    """
-    try:
-        call_schedule = CallSchedule.objects.get(id=call_schedule_id)
-        
-        # Email to admin
-        admin_subject = f'New Call Scheduled - {call_schedule.name}'
-        admin_message = f"""
+def call_schedule_emails(call_schedule):
+    """Admin notification and confirmation emails for a new call"""
+    # Email to admin
+    admin_subject = f'New Call Scheduled - {call_schedule.name}'
+    admin_message = f"""
 New call scheduling request:
 
 Name: {call_schedule.name}
@@ -104,19 +114,11 @@ Scheduled at: {call_schedule.created_at.strftime('%Y-%m-%d %H:%M:%S')}
 
 Contact: {call_schedule.phone}
 Email: {call_schedule.email}
-        """
-        
-        send_mail(
-            subject=admin_subject,
-            message=admin_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.ADMIN_EMAIL],
-            fail_silently=False,
-        )
-        
-        # Confirmation email to user
-        user_subject = '📞 Call Scheduled - Confirmation'
-        user_message = f"""
+    """
+    
+    # Confirmation email to user
+    user_subject = '📞 Call Scheduled - Confirmation'
+    user_message = f"""
 Hi {call_schedule.name},
 
 Your call has been scheduled successfully! 🎉
@@ -146,36 +148,224 @@ GitHub: https://github.com/ShoaibShoukat2
 
 ---
 This is an automated confirmation email.
-        """
+    """
+    
+    return [
+        {
+            'subject': admin_subject,
+            'message': admin_message,
+            'recipient_list': [settings.ADMIN_EMAIL],
+            'fail_silently': False,
+        },
+        {
+            'subject': user_subject,
+            'message': user_message,
+            'recipient_list': [call_schedule.email],
+            'fail_silently': True,
+        },
+    ]
+
+
+@shared_task(bind=True, base=DeliveryTask, max_retries=3)
+def send_call_schedule_email(self, call_schedule_id):
+    """
+    Celery task to send email notifications for call scheduling
+    """
+    try:
+        smtp_breaker.raise_if_open()
+        call_schedule = CallSchedule.objects.get(id=call_schedule_id)
         
-        send_mail(
-            subject=user_subject,
-            message=user_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[call_schedule.email],
-            fail_silently=True,
-        )
+        for email in call_schedule_emails(call_schedule):
+            deliver_mail(from_email=settings.DEFAULT_FROM_EMAIL, **email)
         
         return f"Email sent successfully for call schedule {call_schedule_id}"
         
     except CallSchedule.DoesNotExist:
         return f"Call schedule {call_schedule_id} not found"
+    except CircuitOpenError as exc:
+        # The relay is down; wait for the circuit instead of adding load
+        self.park(exc)
     except Exception as exc:
         # Retry the task if it fails
-        raise self.retry(exc=exc, countdown=60)
+        raise self.retry_with_backoff(exc)
 
 
-@shared_task
-def send_call_reminder(call_schedule_id):
+def _send_batch(task, batch_name, record_ids, model, compose):
+    """
+    Send the emails of many records over one SMTP connection
+    
+    With no ``record_ids`` the next batch is taken from the Redis buffer.
+    Records are loaded with one query. Retries and parking carry only the
+    ids whose emails have not been sent yet.
+    """
+    if record_ids is None:
+        try:
+            record_ids = mail_batches.take(batch_name)
+        except Exception as exc:
+            raise task.retry_with_backoff(exc)
+    remaining = list(record_ids)
+    if not remaining:
+        return "No records to send"
+    
+    connection = get_connection()
+    try:
+        smtp_breaker.raise_if_open()
+        open_connection(connection)
+        for record in model.objects.filter(id__in=remaining):
+            for email in compose(record):
+                deliver_mail(from_email=settings.DEFAULT_FROM_EMAIL, connection=connection, **email)
+            remaining.remove(record.id)
+        
+        return f"Emails sent for {len(record_ids) - len(remaining)} of {len(record_ids)} records"
+        
+    except CircuitOpenError as exc:
+        # The relay is down; wait for the circuit instead of adding load
+        task.park(exc, args=[remaining])
+    except Exception as exc:
+        raise task.retry_with_backoff(exc, args=[remaining])
+    finally:
+        connection.close()
+
+
+@shared_task(bind=True, base=DeliveryTask, max_retries=3)
+def send_contact_email_batch(self, contact_message_ids=None):
+    """
+    Celery task to send the emails of many contact messages at once
+    
+    Queued by ``mail_batches`` when MAIL_BATCH_ENABLED is on, in place of one
+    ``send_contact_email`` per message.
+    """
+    return _send_batch(self, 'contact', contact_message_ids, ContactMessage, contact_message_emails)
+
+
+@shared_task(bind=True, base=DeliveryTask, max_retries=3)
+def send_call_schedule_email_batch(self, call_schedule_ids=None):
+    """
+    Celery task to send the emails of many new calls at once
+    
+    Queued by ``mail_batches`` when MAIL_BATCH_ENABLED is on, in place of one
+    ``send_call_schedule_email`` per call.
+    """
+    return _send_batch(self, 'call', call_schedule_ids, CallSchedule, call_schedule_emails)
+
+
+CALL_STATUS_EMAILS = {
+    'confirmed': (
+        'Call Confirmed',
+        """
+Hi {name},
+
+Your call has been confirmed!
+
+Details:
+- Date: {date}
+- Time: {time} {timezone}
+- Topic: {topic}
+
+I will reach out to you at {phone} at the scheduled time.
+
+Best regards,
+Shoaib Shoukat
+Full Stack Software Engineer
+        """,
+    ),
+    'cancelled': (
+        'Call Cancelled',
+        """
+Hi {name},
+
+Unfortunately our call on {date} at {time} {timezone} about "{topic}" has been cancelled.
+
+If you would still like to talk, please schedule a new call or reply to this email.
+
+Best regards,
+Shoaib Shoukat
+Full Stack Software Engineer
+        """,
+    ),
+}
+
+
+@shared_task(bind=True, base=DeliveryTask, max_retries=3)
+def send_call_status_emails(self, status_changes):
+    """
+    Celery task to tell callers about a bulk status change
+    
+    ``status_changes`` maps a status to the ids of the calls moved to it. One
+    task covers the whole change: the calls are loaded in one query and the
+    emails share one SMTP connection. Retries only cover the callers that
+    have not been emailed yet.
+    """
+    remaining = {status: list(ids) for status, ids in status_changes.items() if status in CALL_STATUS_EMAILS}
+    connection = get_connection()
+    try:
+        smtp_breaker.raise_if_open()
+        open_connection(connection)
+        call_schedules = CallSchedule.objects.filter(
+            id__in=[call_id for ids in remaining.values() for call_id in ids]
+        )
+        sent = 0
+        for call_schedule in call_schedules:
+            if call_schedule.id not in remaining.get(call_schedule.status, []):
+                # Changed again since; the later change sends its own email
+                continue
+            subject, template = CALL_STATUS_EMAILS[call_schedule.status]
+            deliver_mail(
+                subject=subject,
+                message=template.format(
+                    name=call_schedule.name,
+                    date=call_schedule.preferred_date.strftime('%B %d, %Y'),
+                    time=call_schedule.preferred_time.strftime('%I:%M %p'),
+                    timezone=call_schedule.timezone,
+                    topic=call_schedule.topic,
+                    phone=call_schedule.phone,
+                ),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[call_schedule.email],
+                fail_silently=False,
+                connection=connection,
+            )
+            remaining[call_schedule.status].remove(call_schedule.id)
+            sent += 1
+        
+        return f"Status emails sent for {sent} calls"
+        
+    except CircuitOpenError as exc:
+        # The relay is down; wait for the circuit instead of adding load
+        self.park(exc, args=[remaining])
+    except Exception as exc:
+        raise self.retry_with_backoff(exc, args=[remaining])
+    finally:
+        connection.close()
+
+
+@shared_task(bind=True, base=DeliveryTask, max_retries=3)
+def send_call_reminder(self, call_schedule_id, scheduled_for=None):
     """
     Celery task to send reminder email 24 hours before the scheduled call
+    
+    ``scheduled_for`` is the call time the reminder was queued for. ETA
+    tasks that outlived a reschedule (revocation is best effort) see a
+    different call time and exit without sending.
     """
     try:
+        smtp_breaker.raise_if_open()
         call_schedule = CallSchedule.objects.get(id=call_schedule_id)
         
-        if call_schedule.status not in ['pending', 'confirmed']:
+        if call_schedule.status not in ACTIVE_CALL_STATUSES:
             return f"Call {call_schedule_id} is {call_schedule.status}, no reminder sent"
         
+        if scheduled_for and scheduled_for != call_schedule.call_datetime.isoformat():
+            return f"Call {call_schedule_id} was rescheduled, stale reminder skipped"
+        
+        # Claim the reminder so the ETA task and the beat sweep never both send
+        claimed_at = timezone.now()
+        claimed = CallSchedule.objects.filter(
+            id=call_schedule_id, reminder_sent_at__isnull=True
+        ).update(reminder_sent_at=claimed_at)
+        if not claimed:
+            return f"Reminder already sent for call schedule {call_schedule_id}"
+        
         subject = '⏰ Reminder: Scheduled Call Tomorrow'
         message = f"""
 Hi {call_schedule.name},
@@ -201,17 +391,143 @@ Shoaib Shoukat
 Full Stack Software Engineer
         """
         
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[call_schedule.email],
-            fail_silently=True,
-        )
+        try:
+            deliver_mail(
+                subject=subject,
+                message=message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[call_schedule.email],
+                fail_silently=False,
+            )
+        except Exception:
+            # Release the claim so the retry (or the sweep) can send it
+            CallSchedule.objects.filter(
+                id=call_schedule_id, reminder_sent_at=claimed_at
+            ).update(reminder_sent_at=None)
+            raise
         
         return f"Reminder sent for call schedule {call_schedule_id}"
         
     except CallSchedule.DoesNotExist:
         return f"Call schedule {call_schedule_id} not found"
+    except CircuitOpenError as exc:
+        # The relay is down; wait for the circuit instead of adding load
+        self.park(exc)
+    except Exception as exc:
+        raise self.retry_with_backoff(exc)
+
+
+@shared_task
+def send_due_call_reminders():
+    """
+    Periodic sweep that queues upcoming ETA reminders and catches lost ones
+    
+    Reminders are only queued as ETA tasks within the ETA window, so with ETA
+    mode on this queues the ones whose time comes within the window. It also
+    sends reminders that are already due, for calls created while Celery was
+    down or scheduled with ETA mode switched off.
+    """
+    now = timezone.now()
+    lead_time = timedelta(hours=settings.CALL_REMINDER_LEAD_HOURS)
+    active = CallSchedule.objects.filter(
+        status__in=ACTIVE_CALL_STATUSES,
+        reminder_sent_at__isnull=True,
+    )
+    due_ids = active.filter(
+        scheduled_at__gt=now,
+        scheduled_at__lte=now + lead_time,
+    ).values_list('id', flat=True)
+    
+    queued = 0
+    for call_schedule_id in due_ids:
+        send_call_reminder.delay(call_schedule_id)
+        queued += 1
+    
+    if settings.CALL_REMINDER_USE_ETA:
+        upcoming = active.filter(
+            reminder_task_id='',
+            scheduled_at__gt=now + lead_time,
+            scheduled_at__lte=now + lead_time + timedelta(hours=settings.CALL_REMINDER_ETA_WINDOW_HOURS),
+        )
+        for call_schedule in upcoming:
+            if schedule_call_reminder(call_schedule):
+                queued += 1
+    
+    return f"Queued {queued} call reminders"
+
+
+def schedule_call_reminder(call_schedule):
+    """
+    Queue the reminder for a call as an ETA task and remember its task id
+    
+    Any previously queued reminder is revoked first, so this is safe to call
+    again after the call is rescheduled or cancelled. Reminders due beyond
+    CALL_REMINDER_ETA_WINDOW_HOURS are left to ``send_due_call_reminders``,
+    since Redis redelivers ETA tasks still waiting after the visibility
+    timeout.
+    """
+    revoke_call_reminder(call_schedule)
+    
+    if not settings.CALL_REMINDER_USE_ETA:
+        return None
+    if call_schedule.status not in ACTIVE_CALL_STATUSES or call_schedule.reminder_sent_at:
+        return None
+    
+    now = timezone.now()
+    call_datetime = call_schedule.call_datetime
+    if call_datetime <= now:
+        return None
+    
+    eta = max(call_datetime - timedelta(hours=settings.CALL_REMINDER_LEAD_HOURS), now)
+    if eta > now + timedelta(hours=settings.CALL_REMINDER_ETA_WINDOW_HOURS):
+        # Queued by the hourly sweep once it comes within the window
+        return None
+    
+    try:
+        # Spooled with its ETA (and its task id) while the broker is down
+        task_id = apply_or_spool(
+            send_call_reminder,
+            args=[call_schedule.id],
+            kwargs={'scheduled_for': call_datetime.isoformat()},
+            eta=eta.isoformat(),
+        )
+    except Exception as e:
+        # The beat sweep picks the call up once the broker is back
+        print(f"Task spool error: {e}. Reminder left to the periodic sweep...")
+        return None
+    
+    call_schedule.reminder_task_id = task_id
+    CallSchedule.objects.filter(id=call_schedule.id).update(reminder_task_id=task_id)
+    return task_id
+
+
+@shared_task
+def revoke_call_reminders(task_ids):
+    """
+    Revoke queued ETA reminders
+    
+    Runs on a worker so the broadcast never blocks a request while the broker
+    is down.
+    """
+    current_app.control.revoke(task_ids)
+    return f"Revoked {len(task_ids)} reminders"
+
+
+def revoke_reminder_tasks(task_ids):
+    """Queue the revocation of ETA reminders; best effort"""
+    try:
+        enqueue(revoke_call_reminders, list(task_ids))
     except Exception as e:
-        return f"Error sending reminder: {str(e)}"
+        # Stale reminders also check the call time and status before sending
+        print(f"Task spool error: {e}. Could not revoke {len(task_ids)} reminders")
+
+
+def revoke_call_reminder(call_schedule):
+    """Revoke the queued ETA reminder for a call, if there is one"""
+    if not call_schedule.reminder_task_id:
+        return
+    
+    revoke_reminder_tasks([call_schedule.reminder_task_id])
+    
+    call_schedule.reminder_task_id = ''
+    CallSchedule.objects.filter(id=call_schedule.id).update(reminder_task_id='')
@@ -0,0 +1,83 @@
+import gzip
+import unittest
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from portfolio_backend.compression import CompressionMiddleware, brotli, choose_encoding, zstandard
+
+BODY = b'{"name": "Caller", "topic": "Project Discussion"}' * 100
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024, COMPRESSION_ENCODINGS=['zstd', 'br', 'gzip'])
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Responses are compressed with the best encoding the client accepts"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def compress(self, response, accept_encoding='gzip'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get('/api/contact/', HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_negotiation_respects_q_values_then_server_order(self):
+        candidates = ['zstd', 'br', 'gzip']
+
+        self.assertEqual(choose_encoding('gzip, br', candidates), 'br')
+        self.assertEqual(choose_encoding('br;q=0.5, gzip', candidates), 'gzip')
+        self.assertEqual(choose_encoding('*;q=0.1, gzip;q=0', candidates), 'zstd')
+        self.assertIsNone(choose_encoding('identity', candidates))
+
+    def test_json_is_gzipped(self):
+        response = self.compress(HttpResponse(BODY, content_type='application/json'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    @unittest.skipIf(brotli is None, 'Brotli is not installed')
+    def test_brotli_is_preferred_over_gzip(self):
+        response = self.compress(HttpResponse(BODY, content_type='application/json'), 'gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), BODY)
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstd_streams_stay_streamed(self):
+        response = StreamingHttpResponse(iter([BODY, BODY]), content_type='text/csv')
+        response['Content-Length'] = str(2 * len(BODY))
+
+        response = self.compress(response, 'zstd')
+
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        self.assertFalse(response.has_header('Content-Length'))
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        chunks = [decompressor.decompress(chunk) for chunk in response.streaming_content]
+        # Each chunk is flushed as it is produced, not held back until the end
+        self.assertEqual(chunks[0], BODY)
+        self.assertEqual(b''.join(chunks), BODY * 2)
+
+    def test_small_responses_are_left_alone(self):
+        response = self.compress(HttpResponse(b'{"success": true}', content_type='application/json'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_binary_responses_are_left_alone(self):
+        response = self.compress(HttpResponse(BODY, content_type='application/pdf'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_html_only_gets_padded_gzip(self):
+        response = self.compress(HttpResponse(BODY, content_type='text/html'), 'br, zstd, gzip;q=0.1')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_strong_etag_is_weakened(self):
+        original = HttpResponse(BODY, content_type='application/json')
+        original['ETag'] = '"abc"'
+
+        response = self.compress(original)
+
+        self.assertEqual(response['ETag'], 'W/"abc"')
@@ -0,0 +1,238 @@
+import smtplib
+from unittest import mock
+
+import redis
+from celery import shared_task
+from celery.exceptions import Retry
+from django.test import SimpleTestCase, override_settings
+
+from contact import delivery
+from contact.delivery import CircuitBreaker, CircuitOpenError, DeliveryTask, backoff_countdown, is_relay_failure
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeRedis:
+    """The handful of Redis commands the breaker uses, with expiry on a fake clock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.expires = {}
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= self.clock():
+            self.data.pop(key, None)
+            self.expires.pop(key)
+        return key in self.data
+
+    def get(self, key):
+        return str(self.data[key]) if self._live(key) else None
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and self._live(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if ex:
+            self.expires[key] = self.clock() + ex
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data[key]) + 1 if self._live(key) else 1
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        self.expires[key] = self.clock() + seconds
+
+    def hincrby(self, key, field, amount):
+        counters = self.data.setdefault(key, {})
+        counters[field] = counters.get(field, 0) + amount
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Closed -> open -> half-open with a single probe -> closed or open again"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = FakeRedis(self.clock)
+        for target, value in (('contact.delivery.time.time', self.clock),
+                              ('contact.delivery._get_redis', lambda: self.client)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test-breaker', failure_threshold=3, failure_window=60, reset_timeout=30)
+
+    def open_circuit(self):
+        for _ in range(3):
+            self.breaker.before_send()
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.before_send()
+
+        self.breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.before_send()
+        self.assertAlmostEqual(raised.exception.retry_after, 30)
+        self.assertEqual(self.breaker.metrics()['state'], 'open')
+
+    def test_failures_outside_the_window_do_not_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.advance(61)
+
+        self.breaker.record_failure()
+
+        self.breaker.before_send()
+        self.assertEqual(self.breaker.metrics()['state'], 'closed')
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.open_circuit()
+        self.clock.advance(31)
+
+        # The task pre-check never takes the probe
+        self.breaker.raise_if_open()
+        self.breaker.before_send()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_send()
+        self.assertEqual(self.breaker.metrics()['short_circuited'], 1)
+
+    def test_successful_probe_closes_the_circuit(self):
+        self.open_circuit()
+        self.clock.advance(31)
+        self.breaker.before_send()
+
+        self.breaker.record_success()
+
+        self.breaker.before_send()
+        self.breaker.before_send()
+        self.assertEqual(self.breaker.metrics()['state'], 'closed')
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self.open_circuit()
+        self.clock.advance(31)
+        self.breaker.before_send()
+
+        self.breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.raise_if_open()
+        self.clock.advance(31)
+        self.breaker.before_send()
+        self.assertEqual(self.breaker.metrics()['opened'], 2)
+
+    def test_redis_outage_lets_mail_through(self):
+        broken = mock.Mock()
+        broken.get.side_effect = redis.ConnectionError('Connection refused')
+        with mock.patch('contact.delivery._get_redis', return_value=broken):
+            self.breaker.raise_if_open()
+            self.breaker.before_send()
+            self.breaker.record_failure()
+
+
+@override_settings(SMTP_RETRY_BACKOFF_BASE=30, SMTP_RETRY_BACKOFF_MAX=900)
+class BackoffTests(SimpleTestCase):
+    """Full jitter: uniform between zero and a capped exponential ceiling"""
+
+    def test_ceiling_doubles_up_to_the_maximum(self):
+        with mock.patch('contact.delivery.random.uniform', side_effect=lambda low, high: (low, high)):
+            self.assertEqual(backoff_countdown(0), (0, 30))
+            self.assertEqual(backoff_countdown(3), (0, 240))
+            self.assertEqual(backoff_countdown(10), (0, 900))
+
+    def test_countdown_stays_within_bounds(self):
+        for retries in range(8):
+            countdown = backoff_countdown(retries)
+            self.assertGreaterEqual(countdown, 0)
+            self.assertLessEqual(countdown, min(900, 30 * 2 ** retries))
+
+    def test_relay_failures_are_told_apart_from_bad_recipients(self):
+        self.assertTrue(is_relay_failure(smtplib.SMTPServerDisconnected('gone')))
+        self.assertTrue(is_relay_failure(ConnectionRefusedError()))
+        self.assertTrue(is_relay_failure(TimeoutError()))
+        self.assertFalse(is_relay_failure(smtplib.SMTPRecipientsRefused({'x@example.com': (550, b'No such user')})))
+        self.assertFalse(is_relay_failure(ValueError('bad header')))
+
+
+@shared_task(bind=True, base=DeliveryTask)
+def parked_task(self, record_id):
+    raise CircuitOpenError(retry_after=10)
+
+
+@override_settings(SMTP_PARK_MAX_AGE=3600)
+class ParkTests(SimpleTestCase):
+    """Parking re-queues within the reset window, keeps retries and gives up eventually"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('contact.delivery.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def park(self, headers=None):
+        parked_task.push_request(id='task-1', args=[7], kwargs={}, retries=2, headers=headers, called_directly=False)
+        self.addCleanup(parked_task.pop_request)
+        parked_task.park(CircuitOpenError(retry_after=10))
+
+    @mock.patch('celery.canvas.Signature.apply_async')
+    def test_park_requeues_with_jitter_and_keeps_retries(self, apply_async):
+        with self.assertRaises(Retry) as raised:
+            self.park()
+
+        apply_async.assert_called_once_with()
+        signature = raised.exception.sig
+        self.assertEqual(tuple(signature.args), (7,))
+        self.assertEqual(signature.options['retries'], 2)
+        self.assertEqual(signature.options['headers'], {'parked_since': self.clock.now})
+        self.assertGreaterEqual(raised.exception.when, 10)
+        self.assertLessEqual(raised.exception.when, 10 + delivery.smtp_breaker.reset_timeout)
+
+    @mock.patch('celery.canvas.Signature.apply_async')
+    def test_parked_since_is_kept_across_parks(self, apply_async):
+        with self.assertRaises(Retry) as raised:
+            self.park(headers={'parked_since': self.clock.now - 600})
+
+        self.assertEqual(raised.exception.sig.options['headers'], {'parked_since': self.clock.now - 600})
+
+    @mock.patch('celery.canvas.Signature.apply_async')
+    def test_gives_up_after_max_age(self, apply_async):
+        with self.assertRaises(CircuitOpenError):
+            self.park(headers={'parked_since': self.clock.now - 3600})
+
+        apply_async.assert_not_called()
@@ -0,0 +1,193 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import Client, SimpleTestCase, TestCase
+
+from contact.events import EventBroadcaster, event_stream, publish_event
+from contact.models import ContactMessage
+
+
+def make_event(event_id):
+    return {'id': event_id, 'type': 'contact.created', 'data': {'id': event_id}}
+
+
+def session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+class StreamClient:
+    """Drives the ASGI event stream the way a browser connection would"""
+
+    def __init__(self, cookie=None, last_event_id=None):
+        headers = []
+        if cookie:
+            headers.append((b'cookie', f'{settings.SESSION_COOKIE_NAME}={cookie}'.encode()))
+        if last_event_id is not None:
+            headers.append((b'last-event-id', str(last_event_id).encode()))
+        self.incoming = asyncio.Queue()
+        self.messages = []
+        scope = {'type': 'http', 'path': '/api/events/', 'headers': headers}
+        self.task = asyncio.ensure_future(event_stream(scope, self.incoming.get, self.send))
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    @property
+    def status(self):
+        return self.messages[0]['status'] if self.messages else None
+
+    @property
+    def body(self):
+        return b''.join(message.get('body', b'') for message in self.messages[1:]).decode()
+
+    async def wait_for(self, text):
+        for _ in range(200):
+            if text in self.body:
+                return
+            await asyncio.sleep(0.005)
+        raise AssertionError(f'{text!r} not in {self.body!r}')
+
+    async def disconnect(self):
+        await self.incoming.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 1)
+
+
+class EventStreamTests(TestCase):
+    """Only staff can stream; reconnecting viewers resume and slow viewers are dropped"""
+
+    def setUp(self):
+        self.broadcaster = EventBroadcaster(buffer_size=3, queue_size=2)
+        # No Redis here; events are dispatched by the tests
+        self.broadcaster._listen = mock.AsyncMock()
+        for target, value in (
+            ('contact.events.broadcaster', self.broadcaster),
+            ('contact.events._latest_event_id', mock.AsyncMock(return_value=5)),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.staff_cookie = session_cookie(User.objects.create_user('staff', is_staff=True))
+        self.visitor_cookie = session_cookie(User.objects.create_user('visitor'))
+
+    async def test_anonymous_and_non_staff_are_forbidden(self):
+        for cookie in (None, self.visitor_cookie):
+            stream = StreamClient(cookie)
+            await asyncio.wait_for(stream.task, 1)
+
+            self.assertEqual(stream.status, 403)
+            self.assertEqual(self.broadcaster.subscribers, set())
+
+    async def test_staff_receive_dispatched_events(self):
+        stream = StreamClient(self.staff_cookie)
+        await stream.wait_for('retry: ')
+
+        self.assertEqual(stream.status, 200)
+        self.assertIn((b'content-type', b'text/event-stream'), stream.messages[0]['headers'])
+        self.broadcaster.dispatch(make_event(1))
+        await stream.wait_for('id: 1\nevent: contact.created\ndata: {"id": 1}\n\n')
+
+        await stream.disconnect()
+        self.assertEqual(self.broadcaster.subscribers, set())
+
+    async def test_last_event_id_replays_missed_events(self):
+        for event_id in (3, 4, 5):
+            self.broadcaster.dispatch(make_event(event_id))
+
+        stream = StreamClient(self.staff_cookie, last_event_id=3)
+        await stream.wait_for('id: 5\n')
+
+        self.assertNotIn('id: 3\n', stream.body)
+        self.assertIn('id: 4\n', stream.body)
+        await stream.disconnect()
+
+    async def test_events_lost_from_the_buffer_ask_for_a_reset(self):
+        for event_id in (3, 4, 5):
+            self.broadcaster.dispatch(make_event(event_id))
+
+        stream = StreamClient(self.staff_cookie, last_event_id=1)
+        await stream.wait_for('event: reset\n')
+
+        self.assertNotIn('id: 3\n', stream.body)
+        await stream.disconnect()
+
+    async def test_slow_viewer_is_disconnected(self):
+        stream = StreamClient(self.staff_cookie)
+        await stream.wait_for('retry: ')
+
+        # Three events without yielding overflow the two-event queue
+        for event_id in (1, 2, 3):
+            self.broadcaster.dispatch(make_event(event_id))
+        await asyncio.wait_for(stream.task, 1)
+
+        self.assertIn('id: 2\n', stream.body)
+        self.assertNotIn('id: 3\n', stream.body)
+        self.assertEqual(stream.messages[-1], {'type': 'http.response.body', 'body': b''})
+        self.assertEqual(self.broadcaster.subscribers, set())
+
+
+class BroadcasterReplayTests(SimpleTestCase):
+    """Replay returns only events after Last-Event-ID, or None when some are gone"""
+
+    def setUp(self):
+        self.broadcaster = EventBroadcaster(buffer_size=3, queue_size=2)
+        for event_id in (4, 5, 6):
+            self.broadcaster.dispatch(make_event(event_id))
+
+    def test_replay(self):
+        self.assertEqual([event['id'] for event in self.broadcaster.replay(4, 6)], [5, 6])
+        self.assertEqual(self.broadcaster.replay(6, 6), [])
+        self.assertIsNone(self.broadcaster.replay(2, 6))
+
+    def test_up_to_date_viewer_gets_nothing_even_with_an_empty_buffer(self):
+        self.assertEqual(EventBroadcaster(buffer_size=3, queue_size=2).replay(9, 9), [])
+
+
+@mock.patch('contact.events.publish_event')
+class PublishOnCommitTests(TestCase):
+    """Events are published after the write commits, never for rolled back writes"""
+
+    def test_published_after_commit(self, publish):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            message = ContactMessage.objects.create(name='Visitor', email='visitor@example.com', message='Hello there')
+            publish.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        event_type, data = publish.call_args.args
+        self.assertEqual(event_type, 'contact.created')
+        self.assertEqual(data['id'], message.id)
+
+    def test_rolled_back_write_is_not_published(self, publish):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                ContactMessage.objects.create(name='Visitor', email='visitor@example.com', message='Hello there')
+                raise RuntimeError('rolled back')
+
+        self.assertEqual(callbacks, [])
+        publish.assert_not_called()
+
+
+class PublishEventTests(SimpleTestCase):
+    """Published events carry a cluster-wide sequence number and never fail the caller"""
+
+    @mock.patch('contact.events._get_redis')
+    def test_publishes_with_the_next_sequence_number(self, get_redis):
+        get_redis.return_value.incr.return_value = 7
+
+        self.assertEqual(publish_event('call.updated', {'id': 1}), 7)
+
+        channel, payload = get_redis.return_value.publish.call_args.args
+        self.assertEqual(channel, settings.EVENTS_CHANNEL)
+        self.assertEqual(json.loads(payload), {'id': 7, 'type': 'call.updated', 'data': {'id': 1}})
+
+    @mock.patch('contact.events._get_redis')
+    def test_redis_outage_is_swallowed(self, get_redis):
+        get_redis.return_value.incr.side_effect = ConnectionError('Connection refused')
+
+        self.assertIsNone(publish_event('call.updated', {'id': 1}))
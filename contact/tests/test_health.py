@@ -0,0 +1,99 @@
+import time
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, override_settings
+
+from portfolio_backend import health
+
+
+def fail():
+    raise ConnectionError('Connection refused')
+
+
+@override_settings(HEALTH_CHECK_TIMEOUT=0.5, HEALTH_CACHE_SECONDS=60, HEALTH_REQUIRED_CHECKS=['database', 'redis'])
+class HealthProbeTests(TestCase):
+    """/healthz is always cheap; /readyz reports each dependency and is cached"""
+
+    def setUp(self):
+        health._cached = None
+        self.addCleanup(setattr, health, '_cached', None)
+        checks = mock.patch.dict(health.CHECKS, {'redis': mock.Mock(return_value=None), 'smtp': lambda: 'skipped'})
+        checks.start()
+        self.addCleanup(checks.stop)
+
+    def test_liveness_touches_nothing_and_ignores_the_host(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz', HTTP_HOST='10.0.0.7:8000')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_ready_reports_latency_per_dependency(self):
+        response = self.client.get('/readyz', HTTP_HOST='10.0.0.7:8000')
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['status'], 'ready')
+        self.assertEqual(data['checks']['database']['status'], 'ok')
+        self.assertEqual(data['checks']['smtp']['status'], 'skipped')
+        for check in data['checks'].values():
+            self.assertIsInstance(check['latency_ms'], float)
+
+    def test_broker_outage_makes_the_process_unready(self):
+        with mock.patch.dict(health.CHECKS, {'redis': fail}), mock.patch('builtins.print') as log:
+            response = self.client.get('/readyz')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(set(response.json()['checks']['redis']), {'status', 'latency_ms'})
+        self.assertEqual(response.json()['checks']['redis']['status'], 'error')
+        self.assertNotIn('Connection refused', response.content.decode())
+        log.assert_called_once_with('Readiness check redis failed: ConnectionError: Connection refused')
+
+    def test_optional_check_failure_keeps_the_process_ready(self):
+        with mock.patch.dict(health.CHECKS, {'smtp': fail}):
+            response = self.client.get('/readyz')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checks']['smtp']['status'], 'error')
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=0.05)
+    def test_slow_dependency_times_out(self):
+        with mock.patch.dict(health.CHECKS, {'redis': lambda: time.sleep(0.3)}):
+            started = time.perf_counter()
+            response = self.client.get('/readyz')
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(set(response.json()['checks']['redis']), {'status', 'latency_ms'})
+        self.assertLess(elapsed, 0.25)
+
+    def test_results_are_cached(self):
+        self.client.get('/readyz')
+        self.client.get('/readyz')
+
+        self.assertEqual(health.CHECKS['redis'].call_count, 1)
+
+
+@override_settings(HEALTH_CHECK_TIMEOUT=0.5)
+class DatabaseCheckTimeoutTests(TestCase):
+    """The database probe connects and queries with the same timeout as the other checks"""
+
+    def test_timeout_options_per_vendor(self):
+        self.assertEqual(health._database_timeout_options('sqlite', {}), {'timeout': 0.5})
+        self.assertEqual(
+            health._database_timeout_options('postgresql', {'options': '-c search_path=app'}),
+            {'connect_timeout': 1, 'options': '-c search_path=app -c statement_timeout=500'},
+        )
+        self.assertEqual(health._database_timeout_options('mysql', {}), {'connect_timeout': 1, 'read_timeout': 1})
+
+    def test_probe_uses_its_own_connection_with_the_timeout(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        with mock.patch.object(connection.__class__, 'get_new_connection',
+                               autospec=True, side_effect=connection.__class__.get_new_connection) as connect:
+            health.check_database()
+
+        probe, params = connect.call_args.args
+        self.assertIsNot(probe, connection)
+        self.assertEqual(params['timeout'], 0.5)
@@ -0,0 +1,173 @@
+from unittest import mock
+
+import redis
+from django.core import mail
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from contact import mail_batches
+from contact.mail_backends import SimulatedSMTPBackend
+from contact.models import ContactMessage
+from contact.tasks import send_contact_email, send_contact_email_batch
+from portfolio_backend.autoscale import QueueDepthAutoscaler, desired_processes
+from portfolio_backend.celery_app import app
+
+
+def create_messages(count):
+    return ContactMessage.objects.bulk_create(
+        ContactMessage(name=f'Visitor {index}', email=f'visitor{index}@example.com', message='Hello there, world.')
+        for index in range(count)
+    )
+
+
+@override_settings(EMAIL_BACKEND='contact.mail_backends.SimulatedSMTPBackend', ADMIN_EMAIL='admin@example.com')
+class BatchTaskTests(TestCase):
+    """A batch task loads its records once and sends over one SMTP session"""
+
+    def setUp(self):
+        SimulatedSMTPBackend.sessions_opened = 0
+        patcher = mock.patch('contact.tasks.smtp_breaker')
+        self.breaker = breaker = patcher.start()
+        self.addCleanup(patcher.stop)
+        delivery_patcher = mock.patch('contact.delivery.smtp_breaker', breaker)
+        delivery_patcher.start()
+        self.addCleanup(delivery_patcher.stop)
+
+    def test_sends_every_record_with_one_query(self):
+        messages = create_messages(3)
+
+        with self.assertNumQueries(1):
+            send_contact_email_batch.apply(args=[[message.id for message in messages]])
+
+        self.assertEqual(SimulatedSMTPBackend.sessions_opened, 1)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['admin@example.com'] * 3 + [message.email for message in messages],
+        )
+
+    def test_takes_ids_from_the_buffer(self):
+        messages = create_messages(2)
+
+        with mock.patch('contact.mail_batches.take', return_value=[message.id for message in messages]) as take:
+            send_contact_email_batch.apply()
+
+        take.assert_called_once_with('contact')
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_unreachable_relay_counts_towards_the_circuit(self):
+        messages = create_messages(2)
+
+        with mock.patch.object(SimulatedSMTPBackend, 'open', side_effect=ConnectionRefusedError()), \
+                mock.patch.object(send_contact_email_batch, 'retry_with_backoff',
+                                  side_effect=lambda exc, args=None, kwargs=None: exc) as retry:
+            send_contact_email_batch.apply(args=[[message.id for message in messages]])
+
+        self.breaker.record_failure.assert_called_once_with()
+        self.assertEqual(sorted(retry.call_args.kwargs['args'][0]), sorted(message.id for message in messages))
+        self.assertEqual(mail.outbox, [])
+
+    def test_retry_carries_only_unsent_records(self):
+        messages = create_messages(3)
+        sent = []
+
+        def deliver(**email):
+            if len(sent) == 2:
+                raise ConnectionError('Connection reset')
+            sent.append(email['recipient_list'])
+
+        with mock.patch('contact.tasks.deliver_mail', side_effect=deliver), \
+                mock.patch.object(send_contact_email_batch, 'retry_with_backoff',
+                                  side_effect=lambda exc, args=None, kwargs=None: exc) as retry:
+            send_contact_email_batch.apply(args=[[message.id for message in messages]])
+
+        # The first record loaded got both emails before the connection dropped
+        sent_id = next(message.id for message in messages if [message.email] in sent)
+        self.assertEqual(
+            sorted(retry.call_args.kwargs['args'][0]),
+            sorted(message.id for message in messages if message.id != sent_id),
+        )
+
+
+@override_settings(MAIL_BATCH_SIZE=3, MAIL_BATCH_WINDOW_MS=500)
+class EnqueueMailTests(SimpleTestCase):
+    """Records are buffered when batching is on, and sent one by one otherwise"""
+
+    @override_settings(MAIL_BATCH_ENABLED=False)
+    @mock.patch('contact.mail_batches.enqueue')
+    def test_disabled_queues_one_task_per_record(self, enqueue):
+        mail_batches.enqueue_mail('contact', 7)
+
+        enqueue.assert_called_once_with(send_contact_email, 7)
+
+    @override_settings(MAIL_BATCH_ENABLED=True)
+    @mock.patch('contact.mail_batches.apply_or_spool')
+    @mock.patch('contact.mail_batches._get_redis')
+    def test_first_record_schedules_the_window(self, get_redis, apply_or_spool):
+        get_redis.return_value.pipeline.return_value.execute.return_value = [1, True]
+
+        mail_batches.enqueue_mail('contact', 7)
+
+        get_redis.return_value.pipeline.return_value.rpush.assert_called_once_with('portfolio:mail-batch:contact', 7)
+        apply_or_spool.assert_called_once_with(send_contact_email_batch, countdown=0.5)
+
+    @override_settings(MAIL_BATCH_ENABLED=True)
+    @mock.patch('contact.mail_batches.apply_or_spool')
+    @mock.patch('contact.mail_batches._get_redis')
+    def test_full_batch_is_sent_without_waiting(self, get_redis, apply_or_spool):
+        execute = get_redis.return_value.pipeline.return_value.execute
+        execute.return_value = [2, None]
+        mail_batches.enqueue_mail('contact', 8)
+        apply_or_spool.assert_not_called()
+
+        execute.return_value = [3, None]
+        mail_batches.enqueue_mail('contact', 9)
+
+        apply_or_spool.assert_called_once_with(send_contact_email_batch)
+
+    @override_settings(MAIL_BATCH_ENABLED=True)
+    @mock.patch('contact.mail_batches.enqueue')
+    @mock.patch('contact.mail_batches._get_redis')
+    def test_redis_outage_falls_back_to_one_task(self, get_redis, enqueue):
+        get_redis.return_value.pipeline.return_value.execute.side_effect = redis.ConnectionError('Connection refused')
+
+        mail_batches.enqueue_mail('contact', 7)
+
+        enqueue.assert_called_once_with(send_contact_email, 7)
+
+    @mock.patch('contact.mail_batches.apply_or_spool')
+    @mock.patch('contact.mail_batches._get_redis')
+    def test_take_queues_the_rest(self, get_redis, apply_or_spool):
+        get_redis.return_value.pipeline.return_value.execute.return_value = [1, [b'1', b'2', b'3'], 4]
+
+        self.assertEqual(mail_batches.take('contact'), [1, 2, 3])
+
+        get_redis.return_value.pipeline.return_value.lpop.assert_called_once_with('portfolio:mail-batch:contact', 3)
+        apply_or_spool.assert_called_once_with(send_contact_email_batch)
+
+
+@override_settings(AUTOSCALE_TASKS_PER_PROCESS=10, AUTOSCALE_DEPTH_INTERVAL=60)
+class AutoscaleTests(SimpleTestCase):
+    """Workers grow with the queue, not only with what they have reserved"""
+
+    def test_worker_uses_the_queue_depth_autoscaler(self):
+        self.assertEqual(app.conf.worker_autoscaler, 'portfolio_backend.autoscale:QueueDepthAutoscaler')
+        self.assertEqual(app.conf.worker_prefetch_multiplier, 1)
+
+    def test_desired_processes(self):
+        self.assertEqual(desired_processes(reserved=2, queue_depth=0, tasks_per_process=10), 2)
+        self.assertEqual(desired_processes(reserved=2, queue_depth=35, tasks_per_process=10), 4)
+        self.assertEqual(desired_processes(reserved=0, queue_depth=1, tasks_per_process=10), 1)
+
+    @mock.patch('portfolio_backend.autoscale._get_redis')
+    def test_scales_within_bounds_and_keeps_last_depth(self, get_redis):
+        pool = mock.Mock(num_processes=2)
+        autoscaler = QueueDepthAutoscaler(pool, max_concurrency=8, min_concurrency=2, worker=mock.Mock(app=app))
+        get_redis.return_value.llen.return_value = 500
+
+        autoscaler.maybe_scale()
+
+        pool.grow.assert_called_once_with(6)
+        get_redis.return_value.llen.assert_called_once_with('celery')
+
+        autoscaler._depth_checked_at = None
+        get_redis.return_value.llen.side_effect = redis.ConnectionError('Connection refused')
+        self.assertEqual(autoscaler.queue_depth(), 500)
@@ -0,0 +1,233 @@
+"""
+Query-count and latency budgets for every API endpoint
+
+Seeds a dataset, calls each endpoint a number of times and checks the query
+count against ``performance_budgets.json``. A failing budget prints every query
+the request ran, slowest first, with repeated statements counted so N+1
+patterns stand out.
+
+Wall-clock p95 latency depends on the machine, so it is only checked when
+``PERF_LATENCY=1`` is set, together with a larger dataset locally:
+
+    PERF_LATENCY=1 PERF_DATASET_SIZE=5000 PERF_ITERATIONS=50 python manage.py test contact.tests.test_performance
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import date, time as dt_time, timedelta
+from pathlib import Path
+from unittest import mock
+
+from celery.result import AsyncResult
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from contact.models import ContactMessage, CallSchedule, StoredFile, Attachment
+from contact.uploads import upload_token
+from contact.urls import router
+
+BUDGETS_FILE = Path(__file__).with_name('performance_budgets.json')
+BUDGETS = json.loads(BUDGETS_FILE.read_text())
+DATASET_SIZE = int(os.environ.get('PERF_DATASET_SIZE', BUDGETS['dataset_size']))
+ITERATIONS = int(os.environ.get('PERF_ITERATIONS', BUDGETS['iterations']))
+CHECK_LATENCY = os.environ.get('PERF_LATENCY') == '1'
+
+
+def contact_payload(index):
+    return {
+        'name': f'Visitor {index}',
+        'email': f'visitor{index}@example.com',
+        'project': 'Web Development',
+        'message': 'I need help with my project and would like to talk.',
+    }
+
+
+def call_payload(index):
+    return {
+        'name': f'Caller {index}',
+        'email': f'caller{index}@example.com',
+        'phone': '+1234567890',
+        'preferred_date': (date.today() + timedelta(days=2 + index % 30)).isoformat(),
+        'preferred_time': '14:00:00',
+        'timezone': 'America/New_York',
+        'topic': 'Project Discussion',
+        'message': "I'd like to discuss my project requirements.",
+    }
+
+
+def attachment_payload(index):
+    # Distinct content each time, so every upload stores a new file
+    return {'file': SimpleUploadedFile(f'brief-{index}.pdf', b'%PDF-1.4 ' + os.urandom(32 * 1024))}
+
+
+def bulk_read_payload(index):
+    ids = list(ContactMessage.objects.values_list('id', flat=True)[:50])
+    return {'ids': ids, 'is_read': index % 2 == 0}
+
+
+def bulk_status_payload(index):
+    ids = list(CallSchedule.objects.values_list('id', flat=True)[:50])
+    return {'ids': ids, 'status': 'confirmed'}
+
+
+# Budget key -> (HTTP method, path, request body). Every router URL name must
+# appear here, see test_every_router_endpoint_has_a_budget.
+ENDPOINTS = {
+    'api-root GET': ('get', '/', None),
+    'healthz GET': ('get', '/healthz', None),
+    'router-root GET': ('get', '/api/', None),
+    'contact-list GET': ('get', '/api/contact/', None),
+    'contact-list POST': ('post', '/api/contact/', contact_payload),
+    'contact-detail GET': ('get', '/api/contact/{contact_id}/', None),
+    'schedule-call-list GET': ('get', '/api/schedule-call/', None),
+    'schedule-call-list GET sparse': ('get', '/api/schedule-call/?fields=id,preferred_date,preferred_time,status', None),
+    'schedule-call-list POST': ('post', '/api/schedule-call/', call_payload),
+    'schedule-call-detail GET': ('get', '/api/schedule-call/{call_id}/', None),
+    'schedule-call-detail PATCH': ('patch', '/api/schedule-call/{call_id}/', lambda index: {'topic': f'Topic {index}'}),
+    'schedule-call-upcoming GET': ('get', '/api/schedule-call/upcoming/', None),
+    'contact-attachments POST': ('post', '/api/contact/{contact_id}/attachments/', attachment_payload),
+    'schedule-call-attachments POST': ('post', '/api/schedule-call/{call_id}/attachments/', attachment_payload),
+    'contact-bulk-read POST': ('post', '/api/contact/bulk-read/', bulk_read_payload),
+    'schedule-call-bulk-status POST': ('post', '/api/schedule-call/bulk-status/', bulk_status_payload),
+    'attachments-list GET': ('get', '/api/attachments/', None),
+    'attachments-detail GET': ('get', '/api/attachments/{attachment_id}/', None),
+    'attachments-download GET': ('get', '/api/attachments/{attachment_id}/download/', None),
+}
+
+ROUTER_ENDPOINT_NAMES = {'api-root': 'router-root'}
+
+# Endpoints called as an authenticated staff user
+STAFF_ENDPOINTS = {
+    'contact-bulk-read POST',
+    'schedule-call-bulk-status POST',
+    'attachments-list GET',
+    'attachments-detail GET',
+    'attachments-download GET',
+}
+
+# Endpoints whose body is sent as multipart/form-data
+MULTIPART_ENDPOINTS = {'contact-attachments POST', 'schedule-call-attachments POST'}
+
+def p95(samples):
+    ordered = sorted(samples)
+    return ordered[max(0, int(round(0.95 * len(ordered))) - 1)]
+
+
+def format_query_profile(queries):
+    """Render captured queries slowest first, with repeat counts"""
+    repeats = Counter(query['sql'] for query in queries)
+    lines = [f'{len(queries)} queries, {len(repeats)} distinct:']
+    for query in sorted(queries, key=lambda query: float(query['time']), reverse=True):
+        lines.append(f"  {float(query['time']) * 1000:8.2f} ms  x{repeats[query['sql']]}  {query['sql']}")
+    return '\n'.join(lines)
+
+
+@override_settings(ATTACHMENT_MAX_PER_OBJECT=10 ** 6, ATTACHMENT_UPLOAD_WINDOW_MINUTES=10 ** 6)
+@mock.patch('celery.app.task.Task.apply_async', return_value=AsyncResult('perf-test'))
+class EndpointBudgetTests(TestCase):
+    """Every endpoint stays within its query budget, and its latency budget with PERF_LATENCY=1"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Before super(), which runs setUpTestData against the media root
+        cls.media_root = tempfile.mkdtemp(prefix='perf-media-')
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        ContactMessage.objects.bulk_create(
+            ContactMessage(**contact_payload(index)) for index in range(DATASET_SIZE)
+        )
+        # bulk_create skips save(), which fills in scheduled_at
+        for index in range(DATASET_SIZE):
+            payload = call_payload(index)
+            payload['preferred_date'] = date.fromisoformat(payload['preferred_date'])
+            payload['preferred_time'] = dt_time(14, 0)
+            CallSchedule.objects.create(**payload)
+        cls.contact_id = ContactMessage.objects.values_list('id', flat=True).first()
+        cls.call_id = CallSchedule.objects.values_list('id', flat=True).first()
+
+        content = b'%PDF-1.4 ' + b'x' * 64 * 1024
+        path = Path(cls.media_root) / 'attachments' / 'seed.pdf'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        stored_file = StoredFile.objects.create(
+            sha256='0' * 64, file='attachments/seed.pdf', size=len(content), content_type='application/pdf',
+        )
+        Attachment.objects.bulk_create(
+            Attachment(file=stored_file, original_name=f'brief-{index}.pdf', contact_message_id=cls.contact_id)
+            for index in range(DATASET_SIZE)
+        )
+        cls.attachment_id = Attachment.objects.values_list('id', flat=True).first()
+        cls.staff = User.objects.create_user('perf-staff', password='unused', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def test_every_router_endpoint_has_a_budget(self, apply_async):
+        budgeted = {key.split()[0] for key in ENDPOINTS}
+        for pattern in router.urls:
+            name = ROUTER_ENDPOINT_NAMES.get(pattern.name, pattern.name)
+            self.assertIn(name, budgeted, f'No performance budget for router endpoint {pattern.name!r}')
+        self.assertEqual(set(ENDPOINTS), set(BUDGETS['endpoints']))
+
+    def test_endpoints_within_budget(self, apply_async):
+        for key, (method, path, payload) in ENDPOINTS.items():
+            with self.subTest(endpoint=key):
+                self.assert_within_budget(key, method, path, payload)
+
+    def assert_within_budget(self, key, method, path, payload):
+        budget = BUDGETS['endpoints'][key]
+        url = path.format(contact_id=self.contact_id, call_id=self.call_id, attachment_id=self.attachment_id)
+        self.client.force_authenticate(self.staff if key in STAFF_ENDPOINTS else None)
+        request_format = 'multipart' if key in MULTIPART_ENDPOINTS else 'json'
+        request = getattr(self.client, method)
+        headers = {}
+        if key in MULTIPART_ENDPOINTS:
+            owner = ContactMessage(id=self.contact_id) if key.startswith('contact-') else CallSchedule(id=self.call_id)
+            headers['HTTP_X_UPLOAD_TOKEN'] = upload_token(owner)
+
+        durations = []
+        slowest_queries = []
+        for index in range(ITERATIONS):
+            data = payload(index) if payload else None
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request(url, data, format=request_format, **headers) if data else request(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                durations.append((time.perf_counter() - started) * 1000)
+                response.close()
+
+            self.assertLess(response.status_code, 300, f'{key} returned {response.status_code}')
+            if len(captured.captured_queries) > budget['max_queries']:
+                self.fail(
+                    f"{key} ran {len(captured.captured_queries)} queries, "
+                    f"budget is {budget['max_queries']}\n"
+                    + format_query_profile(captured.captured_queries)
+                )
+            if durations[-1] == max(durations):
+                slowest_queries = captured.captured_queries
+
+        observed_p95 = p95(durations)
+        if CHECK_LATENCY and observed_p95 > budget['p95_ms']:
+            self.fail(
+                f"{key} p95 latency {observed_p95:.1f} ms over {ITERATIONS} requests "
+                f"with {DATASET_SIZE} rows, budget is {budget['p95_ms']} ms\n"
+                f"Slowest request: " + format_query_profile(slowest_queries)
+            )
@@ -0,0 +1,169 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from celery import shared_task
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import Client
+
+from portfolio_backend import profiling
+
+STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class ProfileDirMixin:
+    def setUp(self):
+        super().setUp()
+        profile_dir = tempfile.mkdtemp(prefix='profiles-')
+        self.addCleanup(shutil.rmtree, profile_dir, ignore_errors=True)
+        overrides = override_settings(PROFILER_DIR=profile_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=0.1, PROFILER_MAX_PROFILES=2)
+class ProfilerMiddlewareTests(ProfileDirMixin, TestCase):
+    """Requests are profiled when sampled or when staff ask for it"""
+
+    def setUp(self):
+        super().setUp()
+        # The middleware chain is built on the first request, after the override
+        self.client = Client()
+
+    def test_disabled_middleware_removes_itself(self):
+        with override_settings(PROFILER_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilerMiddleware(lambda request: None)
+
+    @mock.patch('portfolio_backend.profiling.random.random', return_value=0.05)
+    def test_sampled_request_is_profiled(self, random):
+        self.client.get('/api/')
+
+        profiles = profiling.list_profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertIn('-request-GET-_api-', profiles[0].name)
+
+    @mock.patch('portfolio_backend.profiling.random.random', return_value=0.5)
+    def test_unsampled_request_is_not_profiled(self, random):
+        self.client.get('/api/')
+
+        self.assertEqual(profiling.list_profiles(), [])
+
+    @mock.patch('portfolio_backend.profiling.random.random', return_value=0.5)
+    def test_profile_header_is_honoured_for_staff_only(self, random):
+        self.client.get('/api/', HTTP_X_PROFILE='1')
+        self.assertEqual(profiling.list_profiles(), [])
+
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+        self.client.get('/api/', HTTP_X_PROFILE='1')
+        self.assertEqual(len(profiling.list_profiles()), 1)
+
+    @mock.patch('portfolio_backend.profiling.random.random', return_value=0.05)
+    def test_keeps_only_the_newest_profiles(self, random):
+        for _ in range(3):
+            self.client.get('/api/')
+
+        self.assertEqual(len(profiling.list_profiles()), 2)
+
+
+@shared_task(bind=True)
+def profiled_task(self):
+    return sum(range(100))
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_TASK_SAMPLE_RATE=0.0)
+class TaskProfilingTests(ProfileDirMixin, SimpleTestCase):
+    """Tasks sent with headers={'profile': True} are profiled through the Celery signals"""
+
+    def setUp(self):
+        super().setUp()
+        profiling.connect_task_profiling()
+        self.addCleanup(task_prerun.disconnect, profiling._start_task_profile)
+        self.addCleanup(task_postrun.disconnect, profiling._finish_task_profile)
+
+    def test_requested_task_is_profiled(self):
+        profiled_task.apply(headers={'profile': True})
+
+        profiles = profiling.list_profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertIn('-task-contact.tests.test_profiling.profiled_task-', profiles[0].name)
+        self.assertEqual(profiling._task_profiles, {})
+
+    def test_other_tasks_are_not_profiled(self):
+        profiled_task.apply()
+
+        self.assertEqual(profiling.list_profiles(), [])
+
+    @override_settings(PROFILER_TASK_SAMPLE_RATE=0.1)
+    @mock.patch('portfolio_backend.profiling.random.random', return_value=0.05)
+    def test_sampled_task_is_profiled(self, random):
+        profiled_task.apply()
+
+        self.assertEqual(len(profiling.list_profiles()), 1)
+
+    def test_hook_does_not_import_the_admin(self):
+        script = (
+            'import sys, django; django.setup(); '
+            'from portfolio_backend.profiling import connect_task_profiling; '
+            'connect_task_profiling(); '
+            'print("django.contrib.admin" in sys.modules)'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'portfolio_backend.settings_worker', 'PROFILER_ENABLED': 'True'},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(result.stdout.strip(), 'False')
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class ProfileAdminViewTests(ProfileDirMixin, TestCase):
+    """Stored profiles are listed and served to staff only"""
+
+    def setUp(self):
+        super().setUp()
+        profiler = profiling.cProfile.Profile()
+        profiler.enable()
+        sum(range(100))
+        profiler.disable()
+        profiling.save_profile(profiler, 'request', 'GET-/api/contact/', 0.25)
+        self.name = profiling.list_profiles()[0].name
+
+    def test_anonymous_and_non_staff_are_sent_to_login(self):
+        self.client.force_login(User.objects.create_user('visitor', password='pw'))
+
+        for url in ('/admin/profiles/', f'/admin/profiles/{self.name}/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('/admin/login/', response['Location'])
+
+    def test_staff_can_browse_and_download_profiles(self):
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+
+        listing = self.client.get('/admin/profiles/')
+        self.assertContains(listing, self.name)
+
+        detail = self.client.get(f'/admin/profiles/{self.name}/', {'sort': 'tottime'})
+        self.assertContains(detail, 'function calls')
+
+        download = self.client.get(f'/admin/profiles/{self.name}/', {'download': '1'})
+        self.assertEqual(download['Content-Disposition'], f'attachment; filename="{self.name}"')
+        download.close()
+
+    def test_unknown_profile_is_not_found(self):
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+
+        self.assertEqual(self.client.get('/admin/profiles/missing.prof/').status_code, 404)
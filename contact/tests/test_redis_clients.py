@@ -0,0 +1,32 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from contact import redis_clients
+
+
+class GetClientTests(SimpleTestCase):
+    """Callers with the same URL and options share one lazily created client"""
+
+    def setUp(self):
+        patcher = mock.patch.dict(redis_clients._clients, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_client_per_url_and_options(self):
+        client = redis_clients.get_client('redis://127.0.0.1:1/0', 0.5)
+
+        self.assertIs(redis_clients.get_client('redis://127.0.0.1:1/0', 0.5), client)
+        for other in (
+            redis_clients.get_client('redis://127.0.0.1:1/1', 0.5),
+            redis_clients.get_client('redis://127.0.0.1:1/0', 1.0),
+            redis_clients.get_client('redis://127.0.0.1:1/0', 0.5, decode_responses=True),
+        ):
+            self.assertIsNot(other, client)
+
+    def test_options_reach_the_connection_pool(self):
+        client = redis_clients.get_client('redis://127.0.0.1:1/0', 0.25, decode_responses=True)
+
+        kwargs = client.connection_pool.connection_kwargs
+        self.assertEqual((kwargs['socket_timeout'], kwargs['socket_connect_timeout']), (0.25, 0.25))
+        self.assertTrue(kwargs['decode_responses'])
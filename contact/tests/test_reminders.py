@@ -0,0 +1,260 @@
+from datetime import date, datetime, time, timezone as dt_timezone
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from contact.models import CallSchedule
+from contact.tasks import (
+    revoke_call_reminders, schedule_call_reminder, send_call_reminder, send_due_call_reminders,
+)
+
+NOW = datetime(2030, 6, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+
+def create_call(preferred_date=date(2030, 6, 5), preferred_time=time(14, 0), **fields):
+    return CallSchedule.objects.create(
+        name='Caller',
+        email='caller@example.com',
+        phone='+1234567890',
+        preferred_date=preferred_date,
+        preferred_time=preferred_time,
+        timezone='UTC',
+        topic='Project Discussion',
+        **fields,
+    )
+
+
+class FrozenTimeMixin:
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('django.utils.timezone.now', return_value=NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+@override_settings(CALL_REMINDER_USE_ETA=True, CALL_REMINDER_LEAD_HOURS=24, CALL_REMINDER_ETA_WINDOW_HOURS=24 * 7)
+@mock.patch('contact.tasks.enqueue')
+@mock.patch('contact.tasks.apply_or_spool', return_value='reminder-2')
+class ScheduleCallReminderTests(FrozenTimeMixin, TestCase):
+    """Each active call gets one ETA reminder, replaced when the call moves"""
+
+    def test_queues_the_reminder_lead_hours_before_the_call(self, apply_or_spool, enqueue):
+        call = create_call()
+
+        self.assertEqual(schedule_call_reminder(call), 'reminder-2')
+
+        apply_or_spool.assert_called_once_with(
+            send_call_reminder,
+            args=[call.id],
+            kwargs={'scheduled_for': '2030-06-05T14:00:00+00:00'},
+            eta='2030-06-04T14:00:00+00:00',
+        )
+        call.refresh_from_db()
+        self.assertEqual(call.reminder_task_id, 'reminder-2')
+        enqueue.assert_not_called()
+
+    def test_call_inside_the_lead_time_is_reminded_now(self, apply_or_spool, enqueue):
+        call = create_call(preferred_date=date(2030, 6, 1), preferred_time=time(18, 0))
+
+        schedule_call_reminder(call)
+
+        self.assertEqual(apply_or_spool.call_args.kwargs['eta'], NOW.isoformat())
+
+    @override_settings(CALL_REMINDER_ETA_WINDOW_HOURS=2)
+    def test_reminder_beyond_the_eta_window_is_left_to_the_sweep(self, apply_or_spool, enqueue):
+        # Reminder due at 14:00, two hours and a minute from now
+        call = create_call(preferred_date=date(2030, 6, 2), preferred_time=time(14, 1), reminder_task_id='reminder-1')
+
+        self.assertIsNone(schedule_call_reminder(call))
+
+        apply_or_spool.assert_not_called()
+        enqueue.assert_called_once_with(revoke_call_reminders, ['reminder-1'])
+        call.refresh_from_db()
+        self.assertEqual(call.reminder_task_id, '')
+
+    def test_past_cancelled_and_reminded_calls_are_skipped(self, apply_or_spool, enqueue):
+        calls = [
+            create_call(preferred_date=date(2030, 5, 31)),
+            create_call(status='cancelled'),
+            create_call(reminder_sent_at=NOW),
+        ]
+
+        for call in calls:
+            self.assertIsNone(schedule_call_reminder(call))
+
+        apply_or_spool.assert_not_called()
+
+    @override_settings(CALL_REMINDER_USE_ETA=False)
+    def test_eta_mode_off_leaves_reminders_to_the_sweep(self, apply_or_spool, enqueue):
+        self.assertIsNone(schedule_call_reminder(create_call()))
+
+        apply_or_spool.assert_not_called()
+
+    def test_rescheduling_revokes_the_previous_reminder(self, apply_or_spool, enqueue):
+        call = create_call(reminder_task_id='reminder-1')
+
+        schedule_call_reminder(call)
+
+        enqueue.assert_called_once_with(revoke_call_reminders, ['reminder-1'])
+        call.refresh_from_db()
+        self.assertEqual(call.reminder_task_id, 'reminder-2')
+
+    def test_spool_failure_is_left_to_the_sweep(self, apply_or_spool, enqueue):
+        apply_or_spool.side_effect = OSError('No space left on device')
+        call = create_call()
+
+        self.assertIsNone(schedule_call_reminder(call))
+
+        call.refresh_from_db()
+        self.assertEqual(call.reminder_task_id, '')
+
+
+@override_settings(CALL_REMINDER_USE_ETA=True, CALL_REMINDER_LEAD_HOURS=24, CALL_REMINDER_ETA_WINDOW_HOURS=24 * 7)
+@mock.patch('contact.events.publish_event')
+@mock.patch('contact.tasks.enqueue')
+@mock.patch('contact.tasks.apply_or_spool', return_value='reminder-2')
+class RescheduleViewTests(FrozenTimeMixin, TestCase):
+    """Moving a call through the API requeues its reminder; other edits do not"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def test_new_time_revokes_and_requeues(self, apply_or_spool, enqueue, publish_event):
+        call = create_call(reminder_task_id='reminder-1', reminder_sent_at=NOW)
+
+        response = self.client.patch(f'/api/schedule-call/{call.id}/', {'preferred_time': '16:00:00'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        enqueue.assert_called_once_with(revoke_call_reminders, ['reminder-1'])
+        self.assertEqual(apply_or_spool.call_args.kwargs['kwargs'], {'scheduled_for': '2030-06-05T16:00:00+00:00'})
+        call.refresh_from_db()
+        self.assertEqual(call.reminder_task_id, 'reminder-2')
+        self.assertIsNone(call.reminder_sent_at)
+
+    def test_other_changes_keep_the_reminder(self, apply_or_spool, enqueue, publish_event):
+        call = create_call(reminder_task_id='reminder-1')
+
+        self.client.patch(f'/api/schedule-call/{call.id}/', {'topic': 'Code Review'}, format='json')
+
+        enqueue.assert_not_called()
+        apply_or_spool.assert_not_called()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendCallReminderTests(TestCase):
+    """The reminder task sends once, and only for the call time it was queued for"""
+
+    def setUp(self):
+        patcher = mock.patch('contact.tasks.smtp_breaker')
+        breaker = patcher.start()
+        self.addCleanup(patcher.stop)
+        delivery_patcher = mock.patch('contact.delivery.smtp_breaker', breaker)
+        delivery_patcher.start()
+        self.addCleanup(delivery_patcher.stop)
+
+    def test_sends_and_claims_the_reminder(self):
+        call = create_call()
+
+        result = send_call_reminder.apply(args=[call.id], kwargs={'scheduled_for': call.call_datetime.isoformat()})
+
+        self.assertEqual(result.get(), f'Reminder sent for call schedule {call.id}')
+        self.assertEqual(mail.outbox[0].to, ['caller@example.com'])
+        call.refresh_from_db()
+        self.assertIsNotNone(call.reminder_sent_at)
+
+    def test_stale_reminder_after_a_reschedule_is_skipped(self):
+        call = create_call()
+        scheduled_for = call.call_datetime.isoformat()
+        call.preferred_time = time(16, 0)
+        call.save()
+
+        result = send_call_reminder.apply(args=[call.id], kwargs={'scheduled_for': scheduled_for})
+
+        self.assertIn('stale reminder skipped', result.get())
+        self.assertEqual(mail.outbox, [])
+        call.refresh_from_db()
+        self.assertIsNone(call.reminder_sent_at)
+
+    def test_cancelled_call_is_not_reminded(self):
+        call = create_call(status='cancelled')
+
+        result = send_call_reminder.apply(args=[call.id])
+
+        self.assertIn('is cancelled', result.get())
+        self.assertEqual(mail.outbox, [])
+
+    def test_second_reminder_is_not_sent(self):
+        call = create_call()
+        send_call_reminder.apply(args=[call.id])
+
+        result = send_call_reminder.apply(args=[call.id])
+
+        self.assertIn('already sent', result.get())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_delivery_releases_the_claim(self):
+        call = create_call()
+
+        with mock.patch('contact.tasks.deliver_mail', side_effect=ConnectionError('Connection reset')), \
+                mock.patch.object(send_call_reminder, 'retry_with_backoff', side_effect=lambda exc: exc) as retry:
+            send_call_reminder.apply(args=[call.id])
+
+        retry.assert_called_once()
+        call.refresh_from_db()
+        self.assertIsNone(call.reminder_sent_at)
+
+
+@override_settings(CALL_REMINDER_USE_ETA=False, CALL_REMINDER_LEAD_HOURS=24)
+@mock.patch('contact.tasks.send_call_reminder.delay')
+class DueReminderSweepTests(FrozenTimeMixin, TestCase):
+    """The hourly sweep queues active, unreminded calls starting within the lead time"""
+
+    def test_queues_only_due_calls(self, delay):
+        due = create_call(preferred_date=date(2030, 6, 2), preferred_time=time(11, 0))
+        create_call(preferred_date=date(2030, 6, 2), preferred_time=time(13, 0))  # Beyond the lead time
+        create_call(preferred_date=date(2030, 6, 1), preferred_time=time(11, 0))  # Already started
+        create_call(preferred_date=date(2030, 6, 2), preferred_time=time(11, 0), status='cancelled')
+        create_call(preferred_date=date(2030, 6, 2), preferred_time=time(11, 0), reminder_sent_at=NOW)
+
+        result = send_due_call_reminders()
+
+        self.assertEqual(result, 'Queued 1 call reminders')
+        delay.assert_called_once_with(due.id)
+
+    def test_uses_scheduled_at_in_the_callers_zone(self, delay):
+        # 20:00 in New York on June 1 is 00:00 UTC on June 2, inside the window
+        call = create_call(preferred_date=date(2030, 6, 1), preferred_time=time(20, 0))
+        call.timezone = 'America/New_York'
+        call.save()
+
+        send_due_call_reminders()
+
+        delay.assert_called_once_with(call.id)
+
+
+@override_settings(CALL_REMINDER_USE_ETA=True, CALL_REMINDER_LEAD_HOURS=24, CALL_REMINDER_ETA_WINDOW_HOURS=2)
+@mock.patch('contact.tasks.send_call_reminder.delay')
+@mock.patch('contact.tasks.apply_or_spool', return_value='reminder-2')
+class UpcomingReminderSweepTests(FrozenTimeMixin, TestCase):
+    """With ETA mode on, the sweep queues reminders as they come within the ETA window"""
+
+    def test_queues_reminders_due_within_the_window(self, apply_or_spool, delay):
+        upcoming = create_call(preferred_date=date(2030, 6, 2), preferred_time=time(13, 30))
+        create_call(preferred_date=date(2030, 6, 2), preferred_time=time(14, 30))  # Beyond the window
+        create_call(preferred_date=date(2030, 6, 2), preferred_time=time(13, 30), reminder_task_id='reminder-1')
+
+        result = send_due_call_reminders()
+
+        self.assertEqual(result, 'Queued 1 call reminders')
+        apply_or_spool.assert_called_once_with(
+            send_call_reminder,
+            args=[upcoming.id],
+            kwargs={'scheduled_for': '2030-06-02T13:30:00+00:00'},
+            eta='2030-06-01T13:30:00+00:00',
+        )
+        upcoming.refresh_from_db()
+        self.assertEqual(upcoming.reminder_task_id, 'reminder-2')
+        delay.assert_not_called()
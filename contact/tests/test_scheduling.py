@@ -0,0 +1,132 @@
+import importlib
+from datetime import date, datetime, time, timezone as dt_timezone
+from unittest import mock
+
+from django.apps import apps
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from contact.models import CallSchedule
+from contact.serializers import CallScheduleSerializer
+
+backfill = importlib.import_module('contact.migrations.0004_backfill_callschedule_scheduled_at')
+
+
+def create_call(preferred_date, preferred_time, call_timezone):
+    return CallSchedule.objects.create(
+        name='Caller',
+        email='caller@example.com',
+        phone='+1234567890',
+        preferred_date=preferred_date,
+        preferred_time=preferred_time,
+        timezone=call_timezone,
+        topic='Project Discussion',
+    )
+
+
+def payload(**fields):
+    return {
+        'name': 'Caller',
+        'email': 'caller@example.com',
+        'phone': '+1234567890',
+        'preferred_date': '2030-06-14',
+        'preferred_time': '14:00:00',
+        'timezone': 'America/New_York',
+        'topic': 'Project Discussion',
+        'message': "I'd like to discuss my project requirements.",
+        **fields,
+    }
+
+
+class ScheduledAtTests(TestCase):
+    """scheduled_at is the UTC instant of the call in the caller's timezone"""
+
+    def test_follows_daylight_saving_time(self):
+        summer = create_call(date(2030, 7, 1), time(14, 0), 'America/New_York')
+        winter = create_call(date(2030, 1, 15), time(14, 0), 'America/New_York')
+
+        self.assertEqual(summer.scheduled_at, datetime(2030, 7, 1, 18, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(winter.scheduled_at, datetime(2030, 1, 15, 19, 0, tzinfo=dt_timezone.utc))
+
+    def test_zone_ahead_of_utc_falls_on_the_previous_utc_day(self):
+        call = create_call(date(2030, 7, 1), time(7, 30), 'Asia/Kolkata')
+
+        self.assertEqual(call.scheduled_at, datetime(2030, 7, 1, 2, 0, tzinfo=dt_timezone.utc))
+
+    def test_saving_only_the_new_time_updates_scheduled_at(self):
+        call = create_call(date(2030, 7, 1), time(14, 0), 'Europe/London')
+
+        call.preferred_time = time(16, 0)
+        call.save(update_fields=['preferred_time'])
+
+        call.refresh_from_db()
+        self.assertEqual(call.scheduled_at, datetime(2030, 7, 1, 15, 0, tzinfo=dt_timezone.utc))
+
+
+class TimezoneValidationTests(TestCase):
+    """Bookings are checked against the caller's clock, with known zone names only"""
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def validate(self, now, **fields):
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            serializer = CallScheduleSerializer(data=payload(**fields))
+            serializer.is_valid()
+        return serializer.errors
+
+    def test_evening_booking_in_los_angeles_after_utc_midnight(self):
+        # 22:00 on June 14 in Los Angeles is already June 15 in UTC
+        now = datetime(2030, 6, 15, 5, 0, tzinfo=dt_timezone.utc)
+
+        errors = self.validate(now, preferred_date='2030-06-14', preferred_time='23:00:00',
+                               timezone='America/Los_Angeles')
+
+        self.assertEqual(errors, {})
+
+    def test_past_time_in_the_callers_zone_is_rejected(self):
+        now = datetime(2030, 6, 15, 5, 0, tzinfo=dt_timezone.utc)
+
+        errors = self.validate(now, preferred_date='2030-06-14', preferred_time='21:00:00',
+                               timezone='America/Los_Angeles')
+
+        self.assertIn('non_field_errors', errors)
+
+    def test_unknown_timezone_is_rejected(self):
+        response = self.client.post('/api/schedule-call/', payload(timezone='America/New_Yrok'), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('America/New_Yrok', response.json()['timezone'][0])
+        self.assertFalse(CallSchedule.objects.exists())
+
+    def test_timezone_is_trimmed(self):
+        now = datetime(2030, 6, 1, tzinfo=dt_timezone.utc)
+
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            serializer = CallScheduleSerializer(data=payload(timezone=' Europe/Paris '))
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        self.assertEqual(serializer.validated_data['timezone'], 'Europe/Paris')
+
+
+class BackfillScheduledAtTests(TestCase):
+    """Migration 0004 fills scheduled_at for existing rows in primary key batches"""
+
+    def test_backfills_every_row(self):
+        calls = [
+            create_call(date(2030, 7, 1), time(14, 0), 'America/New_York'),
+            create_call(date(2030, 1, 15), time(9, 0), 'Europe/Berlin'),
+            # Rows saved before timezone names were validated fall back to UTC
+            create_call(date(2030, 1, 15), time(9, 0), 'Not/AZone'),
+        ]
+        CallSchedule.objects.update(scheduled_at=None)
+
+        with mock.patch.object(backfill, 'BATCH_SIZE', 2):
+            backfill.backfill_scheduled_at(apps, None)
+
+        scheduled = dict(CallSchedule.objects.values_list('id', 'scheduled_at'))
+        self.assertEqual(scheduled, {
+            calls[0].id: datetime(2030, 7, 1, 18, 0, tzinfo=dt_timezone.utc),
+            calls[1].id: datetime(2030, 1, 15, 8, 0, tzinfo=dt_timezone.utc),
+            calls[2].id: datetime(2030, 1, 15, 9, 0, tzinfo=dt_timezone.utc),
+        })
@@ -0,0 +1,169 @@
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from celery import current_app
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from contact import spool
+from contact.models import CallSchedule
+
+
+class TaskSpoolTests(SimpleTestCase):
+    """Spooled tasks are replayed in order, once, across failed drains"""
+
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        settings_override = override_settings(TASK_SPOOL_DIR=spool_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_drain_replays_records_in_order(self):
+        task_ids = [spool.append('contact.tasks.send_contact_email', [index]) for index in range(3)]
+
+        with mock.patch('contact.spool._publish', return_value=True) as publish:
+            self.assertEqual(spool.drain(), 3)
+
+        self.assertEqual([call.args[0]['id'] for call in publish.call_args_list], task_ids)
+        self.assertEqual(publish.call_args_list[0].args[0]['args'], [0])
+        self.assertFalse(spool.pending())
+
+    def test_failed_drain_resumes_from_checkpoint(self):
+        task_ids = [spool.append('contact.tasks.send_contact_email', [index]) for index in range(3)]
+
+        with mock.patch('contact.spool._publish', side_effect=[True, ConnectionError('broker down')]):
+            self.assertEqual(spool.drain(), 1)
+        self.assertTrue(spool.pending())
+
+        spool.append('contact.tasks.send_call_schedule_email', [7])
+        with mock.patch('contact.spool._publish', return_value=True) as publish:
+            self.assertEqual(spool.drain(), 3)
+
+        replayed = [call.args[0] for call in publish.call_args_list]
+        self.assertEqual([record['id'] for record in replayed[:2]], task_ids[1:])
+        self.assertEqual(replayed[2]['task'], 'contact.tasks.send_call_schedule_email')
+        self.assertFalse(spool.pending())
+
+    def tear(self, payload=b'{"id": "torn", "task": "contact.tasks.send_contact_email"}'):
+        """Append a record cut short, as a process killed mid-append leaves it"""
+        with open(spool._path('tasks.spool'), 'ab') as spool_file:
+            spool_file.write(spool._frame(payload)[:20])
+
+    def test_torn_trailing_record_is_ignored(self):
+        spool.append('contact.tasks.send_contact_email', [1])
+        self.tear()
+
+        records = list(spool.read_records(spool._path('tasks.spool')))
+
+        self.assertEqual([record['args'] for record, _ in records], [[1]])
+
+    def test_records_after_a_torn_record_are_replayed(self):
+        spool.append('contact.tasks.send_contact_email', [1])
+        self.tear()
+        task_id = spool.append('contact.tasks.send_contact_email', [2])
+
+        with mock.patch('contact.spool._publish', return_value=True) as publish:
+            self.assertEqual(spool.drain(), 2)
+
+        self.assertEqual([call.args[0]['args'] for call in publish.call_args_list], [[1], [2]])
+        self.assertEqual(publish.call_args_list[1].args[0]['id'], task_id)
+        self.assertFalse(spool.pending())
+
+    def test_unreadable_records_are_logged_and_skipped(self):
+        with open(spool._path('tasks.spool'), 'ab') as spool_file:
+            spool_file.write(spool._frame(b'\xfe not json'))
+        spool.append('contact.tasks.send_contact_email', [3])
+
+        with mock.patch('contact.spool._publish', side_effect=[ConnectionError('broker down')]):
+            self.assertEqual(spool.drain(), 0)
+        with mock.patch('contact.spool._publish', return_value=True) as publish:
+            self.assertEqual(spool.drain(), 1)
+
+        self.assertEqual(publish.call_args.args[0]['args'], [3])
+        self.assertFalse(spool.pending())
+
+    @override_settings(TASK_SPOOL_DRAIN_INTERVAL=0)
+    def test_drainer_survives_a_failed_drain(self):
+        spool.append('contact.tasks.send_contact_email', [4])
+
+        with mock.patch('contact.spool.drain', side_effect=[OSError('disk error'), None]) as drain, \
+                mock.patch('contact.spool.pending', side_effect=[True, True, False]):
+            spool._drain_until_empty()
+
+        self.assertEqual(drain.call_count, 2)
+
+    def test_enqueue_spools_when_broker_is_down(self):
+        task = mock.Mock()
+        task.name = 'contact.tasks.send_contact_email'
+        task.apply_async.side_effect = ConnectionError('broker down')
+
+        with mock.patch('contact.spool.ensure_drainer'):
+            task_id = spool.enqueue(task, 5)
+
+        records = list(spool.read_records(spool._path('tasks.spool')))
+        self.assertEqual(records[0][0]['id'], task_id)
+        self.assertEqual(records[0][0]['args'], [5])
+
+@override_settings(MAIL_BATCH_ENABLED=False, CALL_REMINDER_USE_ETA=True, CALL_REMINDER_ETA_WINDOW_HOURS=24 * 7)
+@override_settings(MAIL_BATCH_ENABLED=False, CALL_REMINDER_USE_ETA=True)
+@mock.patch('contact.events.publish_event')
+@mock.patch('contact.spool.ensure_drainer')
+class BrokerOutageTests(TestCase):
+    """With the broker unreachable, booking and rescheduling spool their tasks without blocking"""
+
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        settings_override = override_settings(TASK_SPOOL_DIR=spool_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Nothing listens on port 1, so every connection is refused
+        pool = current_app.connection_for_write(
+            'redis://127.0.0.1:1/0', transport_options={'max_retries': 0},
+        ).Pool(limit=1)
+        self.addCleanup(pool.force_close_all)
+        patcher = mock.patch('contact.spool._get_connection_pool', return_value=pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def spooled(self):
+        return [record for record, _ in spool.read_records(spool._path('tasks.spool'))]
+
+    def test_booking_and_rescheduling_do_not_block(self, ensure_drainer, publish_event):
+        started = time.perf_counter()
+        response = self.client.post('/api/schedule-call/', {
+            'name': 'Caller',
+            'email': 'caller@example.com',
+            'phone': '+1234567890',
+            'preferred_date': (date.today() + timedelta(days=3)).isoformat(),
+            'preferred_time': '14:00:00',
+            'timezone': 'America/New_York',
+            'topic': 'Project Discussion',
+            'message': "I'd like to discuss my project requirements.",
+        }, format='json')
+        call = CallSchedule.objects.get()
+        self.client.patch(
+            f'/api/schedule-call/{call.id}/',
+            {'preferred_date': (date.today() + timedelta(days=4)).isoformat()},
+            format='json',
+        )
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 201)
+        self.assertLess(elapsed, 1.5)
+        tasks = [record['task'] for record in self.spooled()]
+        self.assertEqual(tasks, [
+            'contact.tasks.send_call_schedule_email',
+            'contact.tasks.send_call_reminder',
+            'contact.tasks.revoke_call_reminders',
+            'contact.tasks.send_call_reminder',
+        ])
+        first_reminder, revoke, second_reminder = self.spooled()[1:]
+        self.assertIn('eta', first_reminder['options'])
+        self.assertEqual(revoke['args'], [[first_reminder['id']]])
+        call.refresh_from_db()
+        self.assertEqual(call.reminder_task_id, second_reminder['id'])
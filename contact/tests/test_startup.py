@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+
+def run_with_settings(settings_module, *args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module},
+        capture_output=True,
+        text=True,
+    )
+
+
+class RoleSettingsTests(SimpleTestCase):
+    """The worker and beat profiles start without the web stack"""
+
+    def test_worker_runs_tasks_without_the_web_stack(self):
+        script = (
+            'import sys, django; django.setup(); '
+            'from portfolio_backend.celery_app import app; '
+            'from celery.signals import worker_init; '
+            'import contact.tasks; '
+            'worker_init.send(sender=None); '
+            'assert "contact.tasks.send_contact_email" in app.tasks; '
+            'print(sorted(m for m in ("rest_framework", "django.contrib.admin", "corsheaders") if m in sys.modules))'
+        )
+        result = run_with_settings('portfolio_backend.settings_worker', '-c', script)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_beat_passes_the_system_checks(self):
+        result = run_with_settings('portfolio_backend.settings_beat', 'manage.py', 'check')
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('System check identified no issues', result.stdout)
+
+
+class StartupProfileCommandTests(SimpleTestCase):
+    """startup_profile reports the time, imports and memory of a fresh process"""
+
+    def test_worker_role(self):
+        stdout = StringIO()
+
+        call_command('startup_profile', role=['worker'], top=3, stdout=stdout, no_color=True)
+
+        heading, summary, *packages = stdout.getvalue().splitlines()
+        self.assertEqual(heading, 'worker (portfolio_backend.settings_worker)')
+        self.assertRegex(summary, r'^  startup \d+ ms, imports \d+ ms across [1-9]\d* modules, RSS \d+\.\d MiB$')
+        self.assertEqual(len(packages), 3)
+        for line in packages:
+            self.assertRegex(line, r'^ +\d+\.\d ms +\d+\.\d% +\w+$')
@@ -0,0 +1,153 @@
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from contact.mail_backends import SimulatedSMTPBackend
+from contact.models import ContactMessage, CallSchedule
+from contact.tasks import revoke_call_reminders, send_call_status_emails
+from contact.transitions import mark_messages, transition_calls
+
+
+def create_call(index, **fields):
+    return CallSchedule.objects.create(
+        name=f'Caller {index}',
+        email=f'caller{index}@example.com',
+        phone='+1234567890',
+        preferred_date=date.today() + timedelta(days=3),
+        preferred_time=time(14, 0),
+        topic='Project Discussion',
+        **fields,
+    )
+
+
+@mock.patch('contact.events.publish_event')
+@mock.patch('contact.spool.enqueue')
+class TransitionCallsTests(TestCase):
+    """Bulk status changes validate, update in one statement and notify once"""
+
+    def test_one_update_per_target_status(self, enqueue, publish_event):
+        pending = [create_call(index) for index in range(3)]
+        confirmed = create_call(3, status='confirmed')
+        changes = {call.id: 'confirmed' for call in pending}
+        changes[confirmed.id] = 'completed'
+
+        with CaptureQueriesContext(connection) as captured:
+            result = transition_calls(changes)
+
+        updates = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(sorted(result['updated']['confirmed']), sorted(call.id for call in pending))
+        self.assertEqual(result['updated']['completed'], [confirmed.id])
+
+    def test_updated_at_is_set(self, enqueue, publish_event):
+        call = create_call(0)
+        before = call.updated_at
+
+        transition_calls({call.id: 'confirmed'})
+
+        call.refresh_from_db()
+        self.assertEqual(call.status, 'confirmed')
+        self.assertGreater(call.updated_at, before)
+
+    def test_invalid_transitions_are_rejected(self, enqueue, publish_event):
+        completed = create_call(0, status='completed')
+        pending = create_call(1)
+
+        result = transition_calls({completed.id: 'pending', pending.id: 'pending', 999999: 'confirmed'})
+
+        self.assertEqual(list(result['rejected']), [completed.id])
+        self.assertEqual(result['unchanged'], [pending.id])
+        self.assertEqual(result['not_found'], [999999])
+        self.assertEqual(result['updated'], {})
+        completed.refresh_from_db()
+        self.assertEqual(completed.status, 'completed')
+
+    def test_one_notification_task_per_batch(self, enqueue, publish_event):
+        calls = [create_call(index) for index in range(5)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_calls({call.id: 'cancelled' for call in calls})
+
+        enqueue.assert_called_once_with(send_call_status_emails, {'cancelled': [call.id for call in calls]})
+
+    def test_cancelling_clears_reminders(self, enqueue, publish_event):
+        call = create_call(0, reminder_task_id='reminder-1')
+
+        with mock.patch('contact.tasks.enqueue') as enqueue_revoke:
+            with self.captureOnCommitCallbacks(execute=True):
+                transition_calls({call.id: 'cancelled'})
+
+        enqueue_revoke.assert_called_once_with(revoke_call_reminders, ['reminder-1'])
+        call.refresh_from_db()
+        self.assertEqual(call.reminder_task_id, '')
+
+
+class SendCallStatusEmailsTests(TestCase):
+    """The batched notification task emails each caller once over one connection"""
+
+    @override_settings(EMAIL_BACKEND='contact.mail_backends.SimulatedSMTPBackend')
+    def test_emails_every_caller_in_one_task(self):
+        calls = [create_call(index, status='confirmed') for index in range(3)]
+        moved_on = create_call(3, status='completed')
+        SimulatedSMTPBackend.sessions_opened = 0
+
+        with mock.patch('contact.tasks.smtp_breaker') as breaker, \
+                mock.patch('contact.delivery.smtp_breaker', breaker):
+            send_call_status_emails.apply(args=[{'confirmed': [call.id for call in calls] + [moved_on.id]}])
+
+        self.assertEqual(SimulatedSMTPBackend.sessions_opened, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [call.email for call in calls])
+        self.assertEqual({message.subject for message in mail.outbox}, {'Call Confirmed'})
+
+
+class BulkEndpointTests(TestCase):
+    """The bulk endpoints are staff only and use the shared service"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='unused', is_staff=True)
+        cls.messages = ContactMessage.objects.bulk_create(
+            ContactMessage(name=f'Visitor {index}', email='visitor@example.com', message='Hello there, world.')
+            for index in range(3)
+        )
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def test_bulk_endpoints_require_staff(self):
+        response = self.client.post('/api/contact/bulk-read/', {'ids': [1]}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_read_marks_messages(self):
+        self.client.force_authenticate(self.staff)
+
+        response = self.client.post(
+            '/api/contact/bulk-read/', {'ids': [message.id for message in self.messages]}, format='json',
+        )
+
+        self.assertEqual(response.json(), {'success': True, 'updated': 3})
+        self.assertEqual(ContactMessage.objects.filter(is_read=True).count(), 3)
+        self.assertEqual(mark_messages([message.id for message in self.messages], is_read=True), 0)
+
+    @mock.patch('contact.spool.enqueue')
+    def test_bulk_status_reports_rejected_calls(self, enqueue):
+        pending = create_call(0)
+        cancelled = create_call(1, status='cancelled')
+        self.client.force_authenticate(self.staff)
+
+        response = self.client.post(
+            '/api/schedule-call/bulk-status/', {'ids': [pending.id, cancelled.id], 'status': 'confirmed'}, format='json',
+        )
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(data['success'])
+        self.assertEqual(data['updated'], [pending.id])
+        self.assertEqual(list(data['rejected']), [str(cancelled.id)])
@@ -0,0 +1,257 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from contact.models import ContactMessage, StoredFile, Attachment
+from contact.uploads import delete_orphaned_files, upload_token
+
+
+class AttachmentUploadTests(TestCase):
+    """Uploads are streamed to content-addressed storage and served to staff"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.contact_message = ContactMessage.objects.create(
+            name='Jane Smith',
+            email='jane@example.com',
+            message='Please see the attached brief.',
+        )
+        cls.staff = User.objects.create_user('staff', password='unused', is_staff=True)
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.url = f'/api/contact/{self.contact_message.id}/attachments/'
+        self.token = upload_token(self.contact_message)
+
+    def upload(self, name='brief.pdf', content=b'%PDF-1.4 brief', token=None):
+        return self.client.post(
+            self.url, {'file': SimpleUploadedFile(name, content)}, format='multipart',
+            HTTP_X_UPLOAD_TOKEN=self.token if token is None else token,
+        )
+
+    def stored_paths(self):
+        return [path for path in Path(self.media_root).rglob('*') if path.is_file()]
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=False, CORS_ALLOWED_ORIGINS=['https://portfolio.example.com'])
+    def test_cross_origin_preflight_allows_the_upload_token(self):
+        response = self.client.options(
+            self.url,
+            HTTP_ORIGIN='https://portfolio.example.com',
+            HTTP_ACCESS_CONTROL_REQUEST_METHOD='POST',
+            HTTP_ACCESS_CONTROL_REQUEST_HEADERS='content-type,x-upload-token',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'https://portfolio.example.com')
+        self.assertIn('x-upload-token', response['Access-Control-Allow-Headers'].split(', '))
+
+    def test_identical_files_are_stored_once(self):
+        first = self.upload('brief.pdf')
+        second = self.upload('copy of brief.pdf')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.json()['data']['sha256'], second.json()['data']['sha256'])
+        self.assertEqual(Attachment.objects.count(), 2)
+        self.assertEqual(StoredFile.objects.count(), 1)
+        sha256 = first.json()['data']['sha256']
+        self.assertEqual(self.stored_paths(), [Path(self.media_root) / 'attachments' / sha256[:2] / sha256[2:4] / sha256])
+
+    @override_settings(ATTACHMENT_MAX_SIZE=100 * 1024)
+    def test_oversized_upload_is_rejected_while_streaming(self):
+        response = self.upload(content=b'x' * 300 * 1024)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertEqual(self.stored_paths(), [])
+
+    def test_disallowed_extension_is_rejected(self):
+        response = self.upload('script.html', b'<script></script>')
+
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_uploads_close_after_the_window(self):
+        with mock.patch('time.time', return_value=time.time() - 2 * 60 * 60):
+            token = upload_token(self.contact_message)
+
+        self.assertEqual(self.upload(token=token).status_code, 403)
+
+    def test_uploads_need_the_creators_token(self):
+        other = ContactMessage.objects.create(name='Other', email='other@example.com', message='Someone else here.')
+
+        self.assertEqual(self.upload(token='').status_code, 403)
+        self.assertEqual(self.upload(token=upload_token(other)).status_code, 403)
+        self.assertFalse(Attachment.objects.exists())
+
+    @mock.patch('contact.mail_batches.enqueue')
+    def test_create_response_carries_the_token(self, enqueue):
+        response = self.client.post('/api/contact/', {
+            'name': 'New Visitor',
+            'email': 'new@example.com',
+            'message': 'I would like to attach a brief.',
+        }, format='json')
+        self.url = f"/api/contact/{response.json()['data']['id']}/attachments/"
+
+        self.assertEqual(self.upload(token=response.json()['upload_token']).status_code, 201)
+
+    def test_staff_can_upload_without_a_token(self):
+        self.client.force_authenticate(self.staff)
+
+        self.assertEqual(self.upload(token='').status_code, 201)
+
+    def test_download_requires_staff(self):
+        attachment_id = self.upload().json()['data']['id']
+
+        response = self.client.get(f'/api/attachments/{attachment_id}/download/')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_download_streams_the_file(self):
+        attachment_id = self.upload(content=b'%PDF-1.4 download me').json()['data']['id']
+        self.client.force_authenticate(self.staff)
+
+        response = self.client.get(f'/api/attachments/{attachment_id}/download/')
+
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 download me')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment; filename="brief.pdf"', response['Content-Disposition'])
+        response.close()
+
+    @override_settings(ATTACHMENT_SENDFILE_MODE='x-accel-redirect', ATTACHMENT_SENDFILE_PREFIX='/protected-media/')
+    def test_download_can_be_offloaded_to_nginx(self):
+        data = self.upload().json()['data']
+        self.client.force_authenticate(self.staff)
+
+        response = self.client.get(f"/api/attachments/{data['id']}/download/")
+
+        sha256 = data['sha256']
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/attachments/{sha256[:2]}/{sha256[2:4]}/{sha256}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Length'], str(data['size']))
+
+    # The admin templates need no collectstatic manifest with the plain storage
+    @override_settings(STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_admin_inline_does_not_query_per_attachment(self):
+        self.client.force_login(self.staff)
+        User.objects.filter(id=self.staff.id).update(is_superuser=True)
+        url = f'/admin/contact/contactmessage/{self.contact_message.id}/change/'
+        self.upload()
+        with CaptureQueriesContext(connection) as one:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.upload('second.pdf', b'%PDF-1.4 second')
+        self.upload('third.pdf', b'%PDF-1.4 third')
+        with CaptureQueriesContext(connection) as three:
+            self.client.get(url)
+
+        self.assertEqual(len(three), len(one))
+
+
+class OrphanedFileCleanupTests(TestCase):
+    """Stored files without attachments and stale temp uploads are deleted"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def stored_file(self, sha256, age):
+        path = Path(self.media_root) / 'attachments' / sha256
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'%PDF-1.4 ' + sha256.encode())
+        stored_file = StoredFile.objects.create(
+            sha256=sha256, file=f'attachments/{sha256}', size=10, content_type='application/pdf',
+        )
+        StoredFile.objects.filter(id=stored_file.id).update(created_at=timezone.now() - age)
+        return stored_file, path
+
+    def test_deletes_only_old_unreferenced_files(self):
+        orphan, orphan_path = self.stored_file('a' * 64, timedelta(days=1))
+        recent, recent_path = self.stored_file('b' * 64, timedelta(minutes=5))
+        used, used_path = self.stored_file('c' * 64, timedelta(days=1))
+        message = ContactMessage.objects.create(name='Jane', email='jane@example.com', message='Hello there, world.')
+        Attachment.objects.create(file=used, original_name='brief.pdf', contact_message=message)
+        tmp_dir = Path(self.media_root) / 'attachments' / 'tmp'
+        tmp_dir.mkdir()
+        stale_upload = tmp_dir / 'upload-stale'
+        stale_upload.write_bytes(b'partial')
+        os.utime(stale_upload, (time.time() - 2 * 60 * 60,) * 2)
+        live_upload = tmp_dir / 'upload-live'
+        live_upload.write_bytes(b'partial')
+
+        self.assertEqual(delete_orphaned_files(grace=timedelta(hours=1)), (1, 1))
+
+        self.assertEqual(set(StoredFile.objects.values_list('id', flat=True)), {recent.id, used.id})
+        self.assertFalse(orphan_path.exists())
+        self.assertTrue(recent_path.exists())
+        self.assertTrue(used_path.exists())
+        self.assertFalse(stale_upload.exists())
+        self.assertTrue(live_upload.exists())
+
+    def test_deleting_the_owner_leaves_an_orphan_to_clean_up(self):
+        stored_file, path = self.stored_file('d' * 64, timedelta(days=1))
+        message = ContactMessage.objects.create(name='Jane', email='jane@example.com', message='Hello there, world.')
+        Attachment.objects.create(file=stored_file, original_name='brief.pdf', contact_message=message)
+
+        message.delete()
+        delete_orphaned_files()
+
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertFalse(path.exists())
+
+    def test_file_reused_after_the_orphan_query_is_kept(self):
+        stored_file, path = self.stored_file('e' * 64, timedelta(days=1))
+        message = ContactMessage.objects.create(name='Jane', email='jane@example.com', message='Hello there, world.')
+
+        def reuse_before_the_lock(*args, **kwargs):
+            # An upload of the same content commits between the query and the lock
+            Attachment.objects.get_or_create(file=stored_file, original_name='brief.pdf', contact_message=message)
+            return transaction.atomic(*args, **kwargs)
+
+        with mock.patch('contact.uploads.transaction', mock.Mock(atomic=reuse_before_the_lock)):
+            self.assertEqual(delete_orphaned_files(), (0, 0))
+
+        self.assertTrue(StoredFile.objects.filter(id=stored_file.id).exists())
+        self.assertTrue(path.exists())
+
+    def test_reupload_restores_a_missing_copy(self):
+        message = ContactMessage.objects.create(name='Jane', email='jane@example.com', message='Hello there, world.')
+        client = APIClient(SERVER_NAME='localhost')
+        url = f'/api/contact/{message.id}/attachments/'
+
+        def upload():
+            return client.post(
+                url, {'file': SimpleUploadedFile('brief.pdf', b'%PDF-1.4 brief')}, format='multipart',
+                HTTP_X_UPLOAD_TOKEN=upload_token(message),
+            )
+
+        path = Path(StoredFile.objects.get(sha256=upload().json()['data']['sha256']).file.path)
+        path.unlink()
+
+        self.assertEqual(upload().status_code, 201)
+
+        self.assertEqual(StoredFile.objects.count(), 1)
+        self.assertTrue(path.exists())
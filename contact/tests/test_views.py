@@ -0,0 +1,56 @@
+from datetime import date, time, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from contact.models import CallSchedule
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= narrows the response and the columns read"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.call_schedule = CallSchedule.objects.create(
+            name='Jane Smith',
+            email='jane@example.com',
+            phone='+1234567890',
+            preferred_date=date.today() + timedelta(days=3),
+            preferred_time=time(14, 0),
+            timezone='America/New_York',
+            topic='Project Discussion',
+            message='A long brief that list views should not have to read.',
+        )
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def test_list_returns_only_requested_fields(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/schedule-call/?fields=id,preferred_date,status')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()[0]), {'id', 'preferred_date', 'status'})
+        self.assertEqual(len(captured.captured_queries), 1)
+        self.assertNotIn('"message"', captured.captured_queries[0]['sql'])
+
+    def test_computed_field_loads_its_dependencies(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/schedule-call/upcoming/?fields=id,is_upcoming')
+
+        self.assertEqual(response.json(), [{'id': self.call_schedule.id, 'is_upcoming': True}])
+        self.assertEqual(len(captured.captured_queries), 1)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/schedule-call/?fields=id,secret')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'])
+
+    def test_without_fields_returns_everything(self):
+        response = self.client.get('/api/schedule-call/')
+
+        self.assertIn('message', response.json()[0])
+        self.assertIn('is_upcoming', response.json()[0])
@@ -0,0 +1,110 @@
+"""
+Bulk status changes for call schedules and contact messages
+
+``transition_calls`` checks each requested change against
+``CALL_STATUS_TRANSITIONS`` and applies the allowed ones with a single
+``UPDATE ... WHERE id IN (...)`` per target status. ``update()`` skips
+``save()`` and the ``post_save`` handlers, so everything they would have done is
+done here once per batch after the transaction commits:
+
+- reminders of closed calls are revoked by a single queued task
+- one dashboard event is published per target status
+- one ``send_call_status_emails`` task notifies every affected caller
+
+``mark_messages`` does the same for ``ContactMessage.is_read``. The API and the
+admin actions both go through these functions.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ContactMessage, CallSchedule
+from .tasks import ACTIVE_CALL_STATUSES, revoke_reminder_tasks, send_call_status_emails
+
+CALL_STATUS_TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'completed', 'cancelled'},
+    'completed': set(),
+    'cancelled': set(),
+}
+
+
+def transition_calls(changes):
+    """
+    Move calls to new statuses
+
+    ``changes`` maps call ids to target statuses. Returns a dict with the
+    ids ``updated`` per status, the ids already in their target status
+    (``unchanged``), the ``rejected`` ids with the reason, and the ids that
+    were ``not_found``.
+    """
+    result = {'updated': {}, 'unchanged': [], 'rejected': {}, 'not_found': []}
+    by_status = defaultdict(list)
+    reminder_task_ids = []
+
+    with transaction.atomic():
+        current = {
+            call_id: (status, reminder_task_id)
+            for call_id, status, reminder_task_id in CallSchedule.objects.select_for_update().filter(
+                id__in=changes
+            ).values_list('id', 'status', 'reminder_task_id')
+        }
+        for call_id, target in changes.items():
+            if call_id not in current:
+                result['not_found'].append(call_id)
+                continue
+            status, reminder_task_id = current[call_id]
+            if status == target:
+                result['unchanged'].append(call_id)
+            elif target not in CALL_STATUS_TRANSITIONS.get(status, ()):
+                result['rejected'][call_id] = f"Cannot change a {status} call to {target}."
+            else:
+                by_status[target].append(call_id)
+                if target not in ACTIVE_CALL_STATUSES and reminder_task_id:
+                    reminder_task_ids.append(reminder_task_id)
+
+        updated_at = timezone.now()
+        for target, call_ids in by_status.items():
+            fields = {'status': target, 'updated_at': updated_at}
+            if target not in ACTIVE_CALL_STATUSES:
+                fields['reminder_task_id'] = ''
+            CallSchedule.objects.filter(id__in=call_ids).update(**fields)
+
+        if by_status:
+            transaction.on_commit(
+                lambda: _after_call_transitions(dict(by_status), reminder_task_ids, updated_at)
+            )
+
+    result['updated'] = dict(by_status)
+    return result
+
+
+def _after_call_transitions(by_status, reminder_task_ids, updated_at):
+    from .events import publish_event
+    from .spool import enqueue
+
+    if reminder_task_ids:
+        revoke_reminder_tasks(reminder_task_ids)
+
+    for status, call_ids in by_status.items():
+        publish_event('call.status_changed', {'ids': call_ids, 'status': status, 'updated_at': updated_at})
+
+    try:
+        enqueue(send_call_status_emails, by_status)
+    except Exception as e:
+        print(f"Task spool error: {e}. Status emails for {sum(map(len, by_status.values()))} calls not sent")
+
+
+def mark_messages(message_ids, is_read=True):
+    """Set ``is_read`` on contact messages with a single UPDATE; returns the number changed"""
+    message_ids = list(message_ids)
+    updated = ContactMessage.objects.filter(id__in=message_ids).exclude(is_read=is_read).update(is_read=is_read)
+
+    if updated:
+        from .events import publish_event
+
+        transaction.on_commit(
+            lambda: publish_event('contact.read_changed', {'ids': message_ids, 'is_read': is_read})
+        )
+    return updated
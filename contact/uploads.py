@@ -0,0 +1,216 @@
+"""
+Streaming attachment uploads
+
+``HashingUploadHandler`` writes each chunk of an upload straight to a temporary
+file next to the final storage location, hashing and counting it as it goes.
+An upload over ``ATTACHMENT_MAX_SIZE`` is stopped at the chunk that crosses
+the limit, so a large file is never held in memory. ``store_upload`` then moves
+the file to a content-addressed path, and identical files share one
+``StoredFile`` row and one copy on disk.
+
+Anonymous uploads need the signed ``upload_token`` returned when the message
+or call was created, so only its creator can attach files, and only within
+``ATTACHMENT_UPLOAD_WINDOW_MINUTES``. Stored files left without attachments
+(after their message or call is deleted) and temporary files of interrupted
+uploads are removed by ``delete_orphaned_files``.
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers, StopUpload
+from django.db import transaction
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from .models import Attachment, StoredFile
+
+REJECTED_TOO_LARGE = 'too_large'
+REJECTED_TYPE = 'type'
+UPLOAD_TOKEN_SALT = 'contact.uploads'
+
+
+class HashedUploadedFile(UploadedFile):
+    """An upload already on disk, with its SHA-256 computed while streaming"""
+
+    def __init__(self, file, name, content_type, size, charset, sha256):
+        super().__init__(file, name, content_type, size, charset)
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Stream the single ``file`` field of a request to disk, hashing as it arrives"""
+
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        # Not named ``file``: Django's parser closes any handler attribute of
+        # that name whenever it skips a field
+        self.temp_file = None
+        self.rejected = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if field_name != 'file' or self.temp_file is not None:
+            raise SkipFile()
+        if Path(file_name).suffix.lower() not in settings.ATTACHMENT_ALLOWED_EXTENSIONS:
+            self.rejected = REJECTED_TYPE
+            raise SkipFile()
+
+        tmp_dir = Path(settings.MEDIA_ROOT) / settings.ATTACHMENT_DIR / 'tmp'
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_file = tempfile.NamedTemporaryFile(dir=tmp_dir, prefix='upload-', delete=False)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.ATTACHMENT_MAX_SIZE:
+            self.rejected = REJECTED_TOO_LARGE
+            self.discard()
+            raise StopUpload(connection_reset=False)
+        self.hasher.update(raw_data)
+        self.temp_file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.temp_file.flush()
+        self.temp_file.seek(0)
+        return HashedUploadedFile(
+            file=self.temp_file,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.size,
+            charset=self.charset,
+            sha256=self.hasher.hexdigest(),
+        )
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def discard(self):
+        if self.temp_file is not None:
+            self.temp_file.close()
+            Path(self.temp_file.name).unlink(missing_ok=True)
+
+
+def store_upload(upload, **owner):
+    """
+    Move a hashed upload into content-addressed storage and attach it
+
+    ``owner`` is ``contact_message=...`` or ``call_schedule=...``. A file
+    whose hash is already stored is dropped and the existing copy reused.
+
+    The ``StoredFile`` row stays locked until the attachment exists, so
+    ``delete_orphaned_files`` cannot delete a file that is being reused.
+    """
+    relative_path = f'{settings.ATTACHMENT_DIR}/{upload.sha256[:2]}/{upload.sha256[2:4]}/{upload.sha256}'
+    final_path = Path(settings.MEDIA_ROOT) / relative_path
+    upload.close()
+
+    with transaction.atomic():
+        stored_file, _ = StoredFile.objects.select_for_update().get_or_create(
+            sha256=upload.sha256,
+            defaults={
+                'file': relative_path,
+                'size': upload.size,
+                # From the extension, not the client, as it is echoed back on download
+                'content_type': mimetypes.guess_type(upload.name)[0] or 'application/octet-stream',
+            },
+        )
+        if final_path.exists():
+            Path(upload.temporary_file_path()).unlink(missing_ok=True)
+        else:
+            # New, or a row whose copy went missing; this upload restores it
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(upload.temporary_file_path(), final_path)
+        return Attachment.objects.create(file=stored_file, original_name=upload.name[:255], **owner)
+
+
+def attachment_response(attachment):
+    """
+    Serve an attachment, offloading the bytes to the web server if configured
+
+    ``ATTACHMENT_SENDFILE_MODE`` is ``'x-accel-redirect'`` (nginx),
+    ``'x-sendfile'`` (Apache/lighttpd) or empty to stream with FileResponse.
+    """
+    stored_file = attachment.file
+    mode = settings.ATTACHMENT_SENDFILE_MODE
+    if mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=stored_file.content_type)
+        response['X-Accel-Redirect'] = settings.ATTACHMENT_SENDFILE_PREFIX + stored_file.file.name
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=stored_file.content_type)
+        response['X-Sendfile'] = stored_file.file.path
+    else:
+        return FileResponse(
+            stored_file.file.open('rb'),
+            as_attachment=True,
+            filename=attachment.original_name,
+            content_type=stored_file.content_type,
+        )
+
+    response['Content-Length'] = stored_file.size
+    response['Content-Disposition'] = content_disposition_header(True, attachment.original_name)
+    return response
+
+
+def upload_token(owner):
+    """Signed token that lets the creator of ``owner`` attach files to it"""
+    return signing.dumps([owner._meta.label_lower, owner.pk], salt=UPLOAD_TOKEN_SALT)
+
+
+def upload_token_valid(token, owner):
+    """Whether ``token`` was issued for ``owner`` within the upload window"""
+    try:
+        value = signing.loads(
+            token,
+            salt=UPLOAD_TOKEN_SALT,
+            max_age=timedelta(minutes=settings.ATTACHMENT_UPLOAD_WINDOW_MINUTES),
+        )
+    except signing.BadSignature:
+        return False
+    return value == [owner._meta.label_lower, owner.pk]
+
+
+def delete_orphaned_files(grace=timedelta(hours=1)):
+    """
+    Delete stored files that no attachment refers to, and abandoned temp files
+
+    Only files older than ``grace`` are considered. Each candidate is
+    re-checked under the row lock ``store_upload`` takes, so a file reused
+    since the query is kept. Returns ``(stored_files, temp_files)`` deleted.
+    """
+    cutoff = timezone.now() - grace
+    deleted_files = 0
+    orphan_ids = StoredFile.objects.filter(attachments__isnull=True, created_at__lt=cutoff).values_list('id', flat=True)
+    for stored_file_id in list(orphan_ids):
+        with transaction.atomic():
+            stored_file = StoredFile.objects.select_for_update().filter(id=stored_file_id).first()
+            if stored_file is None or stored_file.attachments.exists():
+                continue
+            stored_file.delete()
+            # Still under the lock, so no upload can reuse the row before the file is gone
+            stored_file.file.delete(save=False)
+            deleted_files += 1
+
+    deleted_temp_files = 0
+    tmp_dir = Path(settings.MEDIA_ROOT) / settings.ATTACHMENT_DIR / 'tmp'
+    oldest = time.time() - grace.total_seconds()
+    for path in tmp_dir.glob('upload-*') if tmp_dir.is_dir() else []:
+        if path.stat().st_mtime < oldest:
+            path.unlink(missing_ok=True)
+            deleted_temp_files += 1
+    return deleted_files, deleted_temp_files
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ContactMessageViewSet, CallScheduleViewSet
+from .views import ContactMessageViewSet, CallScheduleViewSet, AttachmentViewSet
 
 router = DefaultRouter()
 router.register(r'contact', ContactMessageViewSet, basename='contact')
 router.register(r'schedule-call', CallScheduleViewSet, basename='schedule-call')
+router.register(r'attachments', AttachmentViewSet, basename='attachments')
 
 urlpatterns = [
     path('', include(router.urls)),
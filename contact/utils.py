@@ -0,0 +1,24 @@
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+
+@lru_cache(maxsize=128)
+def resolve_timezone(name):
+    """
+    Resolve a free-text timezone name to a ZoneInfo, falling back to UTC
+    
+    New names are validated by the serializer against ``timezone_names()``;
+    the fallback only covers rows saved before that check existed. Cached
+    because the same handful of zones is resolved on every save and ZoneInfo
+    lookups hit the tz database on a miss.
+    """
+    try:
+        return ZoneInfo((name or '').strip() or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+@lru_cache(maxsize=1)
+def timezone_names():
+    """IANA zone names known to the tz database"""
+    return frozenset(available_timezones())
@@ -1,25 +1,167 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.template.loader import render_to_string
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, SAFE_METHODS
+from django.core.mail import send_mail
 from django.conf import settings
-from .models import ContactMessage, CallSchedule
-from .serializers import ContactMessageSerializer, CallScheduleSerializer
-from .tasks import send_contact_email, send_call_schedule_email
+from django.utils import timezone
+from .models import ContactMessage, CallSchedule, Attachment
+from .serializers import (
+    ContactMessageSerializer, CallScheduleSerializer, AttachmentSerializer,
+    BulkCallStatusSerializer, BulkReadSerializer,
+)
+from .mail_batches import enqueue_mail
+from .tasks import schedule_call_reminder
+from .transitions import mark_messages, transition_calls
+from .uploads import (
+    HashingUploadHandler, REJECTED_TOO_LARGE, REJECTED_TYPE, attachment_response, store_upload,
+    upload_token, upload_token_valid,
+)
 
 
-class ContactMessageViewSet(viewsets.ModelViewSet):
+class SparseFieldsetMixin:
+    """
+    Let GET requests pick their fields with ``?fields=id,name,...``
+    
+    Narrows both the serializer output and the columns read from the
+    database, so unrequested text columns are never loaded.
+    """
+    
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self._parse_requested_fields()
+        return self._requested_fields
+    
+    def _parse_requested_fields(self):
+        if self.request.method not in SAFE_METHODS:
+            return None
+        param = self.request.query_params.get('fields', '')
+        requested = [name.strip() for name in param.split(',') if name.strip()]
+        if not requested:
+            return None
+        
+        available = self.get_serializer_class().Meta.fields
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({
+                'fields': f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(available)}."
+            })
+        return requested
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields:
+            queryset = queryset.only(*self.get_serializer_class().get_model_fields(fields))
+        return queryset
+    
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+
+class AttachmentUploadMixin:
+    """
+    Accept a multipart ``file`` upload at ``POST <object>/attachments/``
+    
+    The body is streamed to disk by ``HashingUploadHandler``, so size and type
+    limits are enforced before the whole upload has arrived. Visitors must
+    send the ``upload_token`` from the create response in an
+    ``X-Upload-Token`` header; it expires after
+    ``ATTACHMENT_UPLOAD_WINDOW_MINUTES``. Up to ``ATTACHMENT_MAX_PER_OBJECT``
+    files are accepted.
+    """
+    attachment_owner_field = None
+    
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser])
+    def attachments(self, request, pk=None):
+        """Attach a file"""
+        owner = self.get_object()
+        
+        token = request.headers.get('X-Upload-Token', '')
+        if not request.user.is_staff and not upload_token_valid(token, owner):
+            return Response(
+                {'success': False, 'message': 'Attachments need a valid upload token, or can no longer be added.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if owner.attachments.count() >= settings.ATTACHMENT_MAX_PER_OBJECT:
+            return Response(
+                {'success': False, 'message': f'At most {settings.ATTACHMENT_MAX_PER_OBJECT} attachments are allowed.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Must be set before the body is read
+        handler = HashingUploadHandler(request)
+        request.upload_handlers = [handler]
+        upload = request.FILES.get('file')
+        
+        if handler.rejected == REJECTED_TOO_LARGE:
+            return Response(
+                {'success': False, 'message': f'Files must be at most {settings.ATTACHMENT_MAX_SIZE} bytes.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        if upload is None:
+            if handler.rejected == REJECTED_TYPE:
+                return Response(
+                    {
+                        'success': False,
+                        'message': f"Allowed file types: {', '.join(settings.ATTACHMENT_ALLOWED_EXTENSIONS)}."
+                    },
+                    status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                )
+            return Response(
+                {'success': False, 'message': 'Send the file in a multipart "file" field.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        attachment = store_upload(upload, **{self.attachment_owner_field: owner})
+        return Response(
+            {
+                'success': True,
+                'message': 'File attached successfully.',
+                'data': AttachmentSerializer(attachment).data
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+
+class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for attachments (admin only)
+    
+    Endpoints:
+    - GET /api/attachments/ - List attachments
+    - GET /api/attachments/{id}/download/ - Download the file
+    """
+    queryset = Attachment.objects.select_related('file')
+    serializer_class = AttachmentSerializer
+    permission_classes = [IsAdminUser]
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the file, via X-Accel-Redirect/X-Sendfile when configured"""
+        return attachment_response(self.get_object())
+
+
+class ContactMessageViewSet(AttachmentUploadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for handling contact form submissions
     
     Endpoints:
     - POST /api/contact/ - Submit a contact message
     - GET /api/contact/ - List all messages (admin only)
+    - POST /api/contact/{id}/attachments/ - Attach a file
+    - POST /api/contact/bulk-read/ - Mark many messages as read/unread (admin only)
+    
+    GET requests accept ``?fields=`` to return a subset of fields.
     """
     queryset = ContactMessage.objects.all()
     serializer_class = ContactMessageSerializer
+    attachment_owner_field = 'contact_message'
     permission_classes = [AllowAny]
     http_method_names = ['get', 'post', 'head', 'options']
     
@@ -31,25 +173,36 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
         # Save the message
         contact_message = serializer.save()
         
-        # Send email notification asynchronously
+        # Send email notification asynchronously (batched with MAIL_BATCH_ENABLED);
+        # if the broker is down the task is spooled to disk and replayed once it is back
         try:
-            send_contact_email.delay(contact_message.id)
+            enqueue_mail('contact', contact_message.id)
         except Exception as e:
-            # If Celery is not running, send email synchronously
-            print(f"Celery error: {e}. Sending email synchronously...")
+            # If the task cannot even be spooled, send email synchronously
+            print(f"Task spool error: {e}. Sending email synchronously...")
             self._send_email_sync(contact_message)
         
         return Response(
             {
                 'success': True,
                 'message': 'Thank you for your message! I will get back to you soon.',
-                'data': serializer.data
+                'data': serializer.data,
+                'upload_token': upload_token(contact_message),
             },
             status=status.HTTP_201_CREATED
         )
     
+    @action(detail=False, methods=['post'], url_path='bulk-read', permission_classes=[IsAdminUser])
+    def bulk_read(self, request):
+        """Mark many messages as read or unread with a single update"""
+        serializer = BulkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        updated = mark_messages(serializer.validated_data['ids'], serializer.validated_data['is_read'])
+        return Response({'success': True, 'updated': updated})
+    
     def _send_email_sync(self, contact_message):
-        """Send email synchronously if Celery is not available"""
+        """Send email synchronously if the task can neither be queued nor spooled"""
         try:
             # Email to admin
             admin_subject = f'New Contact Message from {contact_message.name}'
@@ -101,7 +254,7 @@ Full Stack Software Engineer
             print(f"Error sending email: {e}")
 
 
-class CallScheduleViewSet(viewsets.ModelViewSet):
+class CallScheduleViewSet(AttachmentUploadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for handling call scheduling
     
@@ -109,9 +262,14 @@ class CallScheduleViewSet(viewsets.ModelViewSet):
     - POST /api/schedule-call/ - Schedule a call
     - GET /api/schedule-call/ - List all scheduled calls (admin only)
     - GET /api/schedule-call/upcoming/ - Get upcoming calls
+    - POST /api/schedule-call/{id}/attachments/ - Attach a file
+    - POST /api/schedule-call/bulk-status/ - Change the status of many calls (admin only)
+    
+    GET requests accept ``?fields=`` to return a subset of fields.
     """
     queryset = CallSchedule.objects.all()
     serializer_class = CallScheduleSerializer
+    attachment_owner_field = 'call_schedule'
     permission_classes = [AllowAny]
     http_method_names = ['get', 'post', 'patch', 'head', 'options']
     
@@ -123,36 +281,66 @@ class CallScheduleViewSet(viewsets.ModelViewSet):
         # Save the schedule
         call_schedule = serializer.save()
         
-        # Send email notification asynchronously
+        # Send email notification asynchronously (batched with MAIL_BATCH_ENABLED);
+        # if the broker is down the task is spooled to disk and replayed once it is back
         try:
-            send_call_schedule_email.delay(call_schedule.id)
+            enqueue_mail('call', call_schedule.id)
         except Exception as e:
-            # If Celery is not running, send email synchronously
-            print(f"Celery error: {e}. Sending email synchronously...")
+            # If the task cannot even be spooled, send email synchronously
+            print(f"Task spool error: {e}. Sending email synchronously...")
             self._send_email_sync(call_schedule)
         
+        schedule_call_reminder(call_schedule)
+        
         return Response(
             {
                 'success': True,
                 'message': 'Call scheduled successfully! You will receive a confirmation email shortly.',
-                'data': serializer.data
+                'data': serializer.data,
+                'upload_token': upload_token(call_schedule),
             },
             status=status.HTTP_201_CREATED
         )
     
+    def perform_update(self, serializer):
+        """Requeue the reminder when the call is moved to a new time"""
+        previous_datetime = serializer.instance.call_datetime
+        call_schedule = serializer.save()
+        
+        if call_schedule.call_datetime != previous_datetime:
+            if call_schedule.reminder_sent_at:
+                call_schedule.reminder_sent_at = None
+                CallSchedule.objects.filter(id=call_schedule.id).update(reminder_sent_at=None)
+            schedule_call_reminder(call_schedule)
+    
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Get all upcoming calls"""
-        upcoming_calls = self.queryset.filter(
-            status__in=['pending', 'confirmed']
-        ).filter(
-            preferred_date__gte=timezone.now().date()
-        )
+        upcoming_calls = self.get_queryset().filter(
+            status__in=['pending', 'confirmed'],
+            scheduled_at__gt=timezone.now(),
+        ).order_by('scheduled_at')
         serializer = self.get_serializer(upcoming_calls, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'], url_path='bulk-status', permission_classes=[IsAdminUser])
+    def bulk_status(self, request):
+        """Change the status of many calls, notifying the callers in one batch"""
+        serializer = BulkCallStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        target = serializer.validated_data['status']
+        result = transition_calls(dict.fromkeys(serializer.validated_data['ids'], target))
+        return Response({
+            'success': not result['rejected'] and not result['not_found'],
+            'updated': result['updated'].get(target, []),
+            'unchanged': result['unchanged'],
+            'rejected': result['rejected'],
+            'not_found': result['not_found'],
+        })
+    
     def _send_email_sync(self, call_schedule):
-        """Send email synchronously if Celery is not available"""
+        """Send email synchronously if the task can neither be queued nor spooled"""
         try:
             # Email to admin
             admin_subject = f'New Call Scheduled - {call_schedule.name}'
@@ -2,6 +2,8 @@
 ASGI config for portfolio_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to ``/api/events/`` are answered by the server-sent events stream in
+``contact.events``; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up so settings and the app registry are ready
+from contact.events import event_stream  # noqa: E402
+
+EVENT_STREAM_PATH = '/api/events/'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENT_STREAM_PATH:
+        return await event_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,53 @@
+"""
+Worker autoscaling driven by the broker queue depth
+
+Celery's default autoscaler only counts the tasks a worker has already
+reserved, which with ``worker_prefetch_multiplier = 1`` is at most one per
+process, so a backlog in Redis never makes it grow. ``QueueDepthAutoscaler``
+also reads the length of the default queue and asks for one process per
+``AUTOSCALE_TASKS_PER_PROCESS`` waiting tasks, within the ``--autoscale=max,min``
+bounds of the worker. The depth is read at most every
+``AUTOSCALE_DEPTH_INTERVAL`` seconds; if Redis cannot be reached the last
+known depth is kept.
+"""
+import math
+import time
+
+from celery.worker.autoscale import Autoscaler
+from django.conf import settings
+
+from contact.redis_clients import get_client
+
+
+def _get_redis():
+    return get_client(settings.CELERY_BROKER_URL, settings.AUTOSCALE_DEPTH_INTERVAL)
+
+
+def desired_processes(reserved, queue_depth, tasks_per_process):
+    """Processes wanted for the tasks held by this worker and those waiting in the queue"""
+    return max(reserved, math.ceil(queue_depth / tasks_per_process))
+
+
+class QueueDepthAutoscaler(Autoscaler):
+    """Autoscaler that also grows with the number of tasks waiting in the broker"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._queue_depth = 0
+        self._depth_checked_at = None
+
+    def queue_depth(self):
+        now = time.monotonic()
+        if self._depth_checked_at is None or now - self._depth_checked_at >= settings.AUTOSCALE_DEPTH_INTERVAL:
+            self._depth_checked_at = now
+            try:
+                self._queue_depth = _get_redis().llen(self.worker.app.conf.task_default_queue)
+            except Exception as e:
+                print(f"Redis error: {e}. Autoscaling on the last queue depth ({self._queue_depth})...")
+        return self._queue_depth
+
+    @property
+    def qty(self):
+        return desired_processes(
+            super().qty, self.queue_depth(), settings.AUTOSCALE_TASKS_PER_PROCESS,
+        )
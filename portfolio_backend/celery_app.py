@@ -4,6 +4,7 @@ Celery configuration for portfolio_backend project.
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_init
 
 # Set the default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
@@ -13,19 +14,27 @@ app = Celery('portfolio_backend')
 # Load config from Django settings with CELERY namespace
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
-# Auto-discover tasks from all installed apps
-app.autodiscover_tasks()
+# Only the contact app defines tasks; listing it avoids probing every
+# installed app for a tasks module on worker startup
+app.autodiscover_tasks(['contact'])
 
 # Celery Beat Schedule (for periodic tasks)
 app.conf.beat_schedule = {
-    # Send call reminders 24 hours before scheduled time
+    # Safety sweep for reminders missed by the per-call ETA tasks
     'send-call-reminders': {
-        'task': 'contact.tasks.send_call_reminder',
-        'schedule': crontab(hour=9, minute=0),  # Run daily at 9 AM
+        'task': 'contact.tasks.send_due_call_reminders',
+        'schedule': crontab(minute=0),  # Run hourly
     },
 }
 
 
+@worker_init.connect
+def setup_task_profiling(**kwargs):
+    """Connect the opt-in task profiler once Django is configured"""
+    from .profiling import connect_task_profiling
+    connect_task_profiling()
+
+
 @app.task(bind=True)
 def debug_task(self):
     """Debug task for testing Celery"""
@@ -0,0 +1,191 @@
+"""
+Response compression with zstd, brotli and gzip
+
+``CompressionMiddleware`` compresses text responses of at least
+``COMPRESSION_MIN_SIZE`` bytes with the best encoding in
+``COMPRESSION_ENCODINGS`` that the client accepts. zstd and brotli are used
+when the ``zstandard`` and ``Brotli`` packages are installed; gzip is always
+available.
+
+HTML pages, which carry CSRF tokens, only get gzip with Django's BREACH
+padding. Streaming responses (downloads, exports) are compressed chunk by
+chunk and flushed after each one, so they stay streamed and nothing is
+buffered. Static files never reach this middleware: WhiteNoise serves the
+copies precompressed by ``collectstatic``.
+"""
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+}
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def compress(self, data):
+        return compress_string(data, max_random_bytes=GZipMiddleware.max_random_bytes)
+
+    def stream(self):
+        # Same level as compress_string
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def compress(self, data):
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def stream(self):
+        compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data)
+
+    def stream(self):
+        compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+        return (
+            compressor.compress,
+            lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+
+
+ENCODERS = {'gzip': GzipEncoder()}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder()
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder()
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header, candidates):
+    """The client's highest-q coding among ``candidates``, ties going to the earliest"""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = accepted.get(name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def is_compressible(content_type):
+    return (
+        content_type.startswith('text/')
+        or content_type in COMPRESSIBLE_TYPES
+        or content_type.endswith(('+json', '+xml'))
+    )
+
+
+def _compress_stream(encoder, chunks):
+    process, flush, finish = encoder.stream()
+    for chunk in chunks:
+        data = process(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+async def _compress_async_stream(encoder, chunks):
+    process, flush, finish = encoder.stream()
+    async for chunk in chunks:
+        data = process(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+class CompressionMiddleware:
+    """Compress responses with the best encoding the client accepts"""
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.encodings = [name for name in settings.COMPRESSION_ENCODINGS if name in ENCODERS]
+
+    def __call__(self, request):
+        return self.compress(request, self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not is_compressible(content_type):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        candidates = ['gzip'] if content_type == 'text/html' else self.encodings
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), candidates)
+        if encoding is None:
+            return response
+        encoder = ENCODERS[encoding]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _compress_async_stream(encoder, response.streaming_content)
+            else:
+                response.streaming_content = _compress_stream(encoder, response.streaming_content)
+            # The compressed length is not known up front
+            response.headers.pop('Content-Length', None)
+        else:
+            compressed = encoder.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The body differs from the uncompressed one, so a strong ETag no longer matches it
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
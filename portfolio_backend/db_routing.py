@@ -0,0 +1,101 @@
+"""
+Read-replica routing
+
+``ReplicaRoutingMiddleware`` marks safe-method API requests as replica reads,
+and ``ReplicaRouter`` sends their queries to one of ``REPLICA_DATABASES``.
+Everything else (writes, admin, Celery tasks, reads inside a transaction)
+stays on ``default``.
+
+After a client writes, its reads stick to the primary for
+``REPLICA_STICKY_SECONDS`` so it sees its own writes despite replication lag.
+The client itself carries the pin: keying on its address would pin every
+client behind the same proxy, and a per-process cache would not be seen by
+the other workers. A write response sets a short-lived cookie, and also
+returns the pin's expiry time in the ``X-DB-Pin`` header. Cross-origin
+clients cannot use the cookie (CORS credentials are off), so they send that
+header back on their following requests.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_use_replica = ContextVar('use_replica', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@contextmanager
+def reads_from_replica():
+    """Send the reads in this block to a replica, e.g. for exports and stats"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Route reads to a replica when the current request allows it"""
+
+    def db_for_read(self, model, **hints):
+        if not settings.REPLICA_DATABASES or not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+def _is_pinned(request):
+    if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+        return True
+    try:
+        pinned_until = float(request.headers.get(settings.REPLICA_PIN_HEADER, ''))
+    except ValueError:
+        return False
+    # Bounded, so a client cannot keep itself off the replicas indefinitely
+    now = time.time()
+    return now < pinned_until <= now + settings.REPLICA_STICKY_SECONDS
+
+
+class ReplicaRoutingMiddleware:
+    """Allow replica reads for safe API requests from clients that have not just written"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+
+        if request.method in SAFE_METHODS:
+            use_replica = (
+                request.path.startswith(tuple(settings.REPLICA_READ_PATH_PREFIXES))
+                and not _is_pinned(request)
+            )
+            token = _use_replica.set(use_replica)
+            try:
+                return self.get_response(request)
+            finally:
+                _use_replica.reset(token)
+
+        response = self.get_response(request)
+        if response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+            response[settings.REPLICA_PIN_HEADER] = str(int(time.time()) + settings.REPLICA_STICKY_SECONDS)
+        return response
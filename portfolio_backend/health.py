@@ -0,0 +1,156 @@
+"""
+Liveness and readiness probes
+
+``HealthCheckMiddleware`` answers two paths before any other middleware runs,
+so probes skip host validation, HTTPS redirects, sessions and routing:
+
+- ``/healthz``: liveness. The process can serve requests; nothing external
+  is touched.
+- ``/readyz``: readiness. Checks the database, the Redis broker and the SMTP
+  relay in parallel, each within ``HEALTH_CHECK_TIMEOUT`` seconds, and reports
+  the status and latency of each. Returns 503 when a check in
+  ``HEALTH_REQUIRED_CHECKS`` fails, so the load balancer stops sending traffic
+  to this process. Failure details are printed to the log, not returned.
+
+Readiness results are cached in the process for ``HEALTH_CACHE_SECONDS``, so
+frequent probes from several load balancers cost one round of checks.
+"""
+import math
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import JsonResponse
+from django.utils.cache import add_never_cache_headers
+
+from contact.redis_clients import get_client
+
+LIVENESS_PATH = '/healthz'
+READINESS_PATH = '/readyz'
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='readiness-check')
+_cache_lock = threading.Lock()
+_cached = None
+
+
+def _get_redis():
+    return get_client(settings.CELERY_BROKER_URL, settings.HEALTH_CHECK_TIMEOUT)
+
+
+def _database_timeout_options(vendor, options):
+    """Driver options that bound connecting and querying to HEALTH_CHECK_TIMEOUT"""
+    timeout = settings.HEALTH_CHECK_TIMEOUT
+    if vendor == 'postgresql':
+        statement_timeout = f"-c statement_timeout={int(timeout * 1000)}"
+        return {
+            'connect_timeout': max(1, math.ceil(timeout)),
+            'options': f"{options.get('options', '')} {statement_timeout}".strip(),
+        }
+    if vendor == 'mysql':
+        return {'connect_timeout': max(1, math.ceil(timeout)), 'read_timeout': max(1, math.ceil(timeout))}
+    if vendor == 'sqlite':
+        return {'timeout': timeout}
+    return {}
+
+
+def check_database():
+    # A separate connection, so the timeouts never apply to request queries
+    connection = connections[DEFAULT_DB_ALIAS]
+    options = connection.settings_dict.get('OPTIONS', {})
+    probe = connection.__class__(
+        {**connection.settings_dict, 'OPTIONS': {**options, **_database_timeout_options(connection.vendor, options)}},
+        DEFAULT_DB_ALIAS,
+    )
+    try:
+        with probe.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        probe.close()
+
+
+def check_redis():
+    _get_redis().ping()
+
+
+def check_smtp():
+    if settings.EMAIL_BACKEND != SMTP_BACKEND:
+        return 'skipped'
+    smtp_class = smtplib.SMTP_SSL if settings.EMAIL_USE_SSL else smtplib.SMTP
+    with smtp_class(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=settings.HEALTH_CHECK_TIMEOUT) as smtp:
+        smtp.noop()
+    return 'ok'
+
+
+CHECKS = {
+    'database': check_database,
+    'redis': check_redis,
+    'smtp': check_smtp,
+}
+
+
+def _timed(name, check):
+    started = time.perf_counter()
+    try:
+        status = check() or 'ok'
+    except Exception as e:
+        # Details stay in the log; the probe response is public
+        print(f"Readiness check {name} failed: {type(e).__name__}: {e}")
+        status = 'error'
+    return {'status': status, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+
+def run_checks():
+    """Run every check in parallel, giving up on any that exceeds the timeout"""
+    futures = {name: _executor.submit(_timed, name, check) for name, check in CHECKS.items()}
+    wait(futures.values(), timeout=settings.HEALTH_CHECK_TIMEOUT)
+    results = {}
+    for name, future in futures.items():
+        if future.done():
+            results[name] = future.result()
+        else:
+            print(f"Readiness check {name} failed: no answer within {settings.HEALTH_CHECK_TIMEOUT}s")
+            results[name] = {'status': 'error', 'latency_ms': settings.HEALTH_CHECK_TIMEOUT * 1000}
+    return results
+
+
+def readiness():
+    """Cached readiness report: ``(ready, report)``"""
+    global _cached
+    with _cache_lock:
+        now = time.monotonic()
+        if _cached is None or _cached[0] <= now:
+            checks = run_checks()
+            ready = all(checks[name]['status'] != 'error' for name in settings.HEALTH_REQUIRED_CHECKS)
+            report = {
+                'status': 'ready' if ready else 'unavailable',
+                'checked_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'checks': checks,
+            }
+            _cached = (now + settings.HEALTH_CACHE_SECONDS, ready, report)
+        return _cached[1], _cached[2]
+
+
+def _probe_response(data, status=200):
+    response = JsonResponse(data, status=status)
+    add_never_cache_headers(response)
+    return response
+
+
+class HealthCheckMiddleware:
+    """Serve the liveness and readiness probes; must be first in MIDDLEWARE"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        path = request.path_info.rstrip('/')
+        if path == LIVENESS_PATH:
+            return _probe_response({'status': 'ok'})
+        if path == READINESS_PATH:
+            ready, report = readiness()
+            return _probe_response(report, status=200 if ready else 503)
+        return self.get_response(request)
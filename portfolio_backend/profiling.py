@@ -0,0 +1,173 @@
+"""
+Opt-in cProfile sampling for requests and Celery tasks
+
+With ``PROFILER_ENABLED`` off (the default) the middleware removes itself at
+startup and no Celery signal handlers are connected, so there is no per-request
+or per-task cost. When on, a request or task is profiled if it is sampled
+(``PROFILER_SAMPLE_RATE`` / ``PROFILER_TASK_SAMPLE_RATE``), or if it asks for it:
+
+- requests from a staff user with the ``X-Profile: 1`` header
+- tasks sent with ``headers={'profile': True}``
+
+Profiles are written to ``PROFILER_DIR``, which keeps only the newest
+``PROFILER_MAX_PROFILES`` files, and can be browsed and downloaded at
+``/admin/profiles/``.
+"""
+import cProfile
+import io
+import pstats
+import random
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, Http404
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SAFE_LABEL = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def _profile_dir():
+    return Path(settings.PROFILER_DIR)
+
+
+def save_profile(profiler, kind, label, duration):
+    """Write a profile into the ring, dropping the oldest beyond the limit"""
+    profile_dir = _profile_dir()
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    label = SAFE_LABEL.sub('_', label).strip('_')[:80] or 'root'
+    name = f'{time.time():.6f}-{kind}-{label}-{duration * 1000:.0f}ms.prof'
+    profiler.dump_stats(profile_dir / name)
+
+    for stale in list_profiles()[settings.PROFILER_MAX_PROFILES:]:
+        stale.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Stored profiles, newest first"""
+    profile_dir = _profile_dir()
+    if not profile_dir.is_dir():
+        return []
+    return sorted(profile_dir.glob('*.prof'), key=lambda path: path.name, reverse=True)
+
+
+def _is_sampled(rate):
+    return rate > 0 and random.random() < rate
+
+
+class ProfilerMiddleware:
+    """Profile sampled requests and staff requests that send ``X-Profile: 1``"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = request.META.get(PROFILE_HEADER) == '1' and request.user.is_staff
+        if not requested and not _is_sampled(settings.PROFILER_SAMPLE_RATE):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profile is already running in this process
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            save_profile(profiler, 'request', f'{request.method}-{request.path}', duration)
+        return response
+
+
+_task_profiles = {}
+
+
+def _start_task_profile(task_id=None, task=None, **kwargs):
+    requested = bool((task.request.headers or {}).get('profile'))
+    if requested or _is_sampled(settings.PROFILER_TASK_SAMPLE_RATE):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return
+        _task_profiles[task_id] = (profiler, time.perf_counter())
+
+
+def _finish_task_profile(task_id=None, task=None, **kwargs):
+    entry = _task_profiles.pop(task_id, None)
+    if entry is None:
+        return
+    profiler, started = entry
+    profiler.disable()
+    save_profile(profiler, 'task', task.name, time.perf_counter() - started)
+
+
+def connect_task_profiling():
+    """Hook the task profiler into Celery when profiling is enabled"""
+    if not settings.PROFILER_ENABLED:
+        return
+    from celery.signals import task_postrun, task_prerun
+
+    task_prerun.connect(_start_task_profile, weak=False)
+    task_postrun.connect(_finish_task_profile, weak=False)
+
+
+def _get_profile(name):
+    for path in list_profiles():
+        if path.name == name:
+            return path
+    raise Http404('Profile not found')
+
+
+def profile_list(request):
+    """Admin page listing the stored profiles"""
+    # Admin is imported here so Celery workers loading the task hook don't pay for it
+    from django.contrib import admin
+    from django.template.response import TemplateResponse
+
+    profiles = []
+    for path in list_profiles():
+        _, kind, rest = path.stem.split('-', 2)
+        profiles.append({
+            'name': path.name,
+            'kind': kind,
+            'label': rest.rsplit('-', 1)[0],
+            'duration': rest.rsplit('-', 1)[-1],
+            'captured_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(float(path.stem.split('-', 1)[0]))),
+        })
+    return TemplateResponse(request, 'admin/profiles/list.html', {
+        **admin.site.each_context(request),
+        'title': 'Profiles',
+        'profiles': profiles,
+        'enabled': settings.PROFILER_ENABLED,
+    })
+
+
+def profile_detail(request, name):
+    """Admin page showing one profile's stats, or the raw file with ?download=1"""
+    from django.contrib import admin
+    from django.template.response import TemplateResponse
+
+    path = _get_profile(name)
+    if request.GET.get('download'):
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    output = io.StringIO()
+    pstats.Stats(str(path), stream=output).strip_dirs().sort_stats(sort).print_stats(settings.PROFILER_STATS_LIMIT)
+    return TemplateResponse(request, 'admin/profiles/detail.html', {
+        **admin.site.each_context(request),
+        'title': f'Profile {path.name}',
+        'name': path.name,
+        'sort': sort,
+        'stats': output.getvalue(),
+    })
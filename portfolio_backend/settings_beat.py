@@ -0,0 +1,18 @@
+"""
+Settings for the Celery beat process.
+
+Beat only reads its schedule through django_celery_beat's database
+scheduler and publishes tasks by name, so nothing else is loaded.
+Run with ``DJANGO_SETTINGS_MODULE=portfolio_backend.settings_beat``.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'django_celery_beat',
+]
+
+MIDDLEWARE = []
+
+# Celery runs the system checks on startup, which import the URLconf
+ROOT_URLCONF = 'portfolio_backend.urls_empty'
@@ -0,0 +1,10 @@
+"""
+Settings for web (gunicorn/uvicorn) processes.
+
+Same as ``settings`` without the apps only Celery beat needs.
+Run with ``DJANGO_SETTINGS_MODULE=portfolio_backend.settings_web``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'django_celery_beat']
@@ -0,0 +1,18 @@
+"""
+Settings for Celery worker processes.
+
+Workers only run the contact tasks, so the admin, sessions, static files,
+DRF, CORS and beat apps are not loaded, and no middleware is configured.
+Run with ``DJANGO_SETTINGS_MODULE=portfolio_backend.settings_worker``.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'contact',
+]
+
+MIDDLEWARE = []
+
+# Celery runs the system checks on startup, which import the URLconf
+ROOT_URLCONF = 'portfolio_backend.urls_empty'
@@ -8,6 +8,8 @@ from django.conf.urls.static import static
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from . import profiling
+
 
 @api_view(['GET'])
 def api_root(request):
@@ -18,12 +20,18 @@ def api_root(request):
         'endpoints': {
             'contact': '/api/contact/',
             'schedule_call': '/api/schedule-call/',
+            'attachments': '/api/attachments/',
+            'events': '/api/events/',
+            'healthz': '/healthz',
+            'readyz': '/readyz',
             'admin': '/admin/',
         }
     })
 
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profiling.profile_list), name='profile-list'),
+    path('admin/profiles/<str:name>/', admin.site.admin_view(profiling.profile_detail), name='profile-detail'),
     path('admin/', admin.site.urls),
     path('api/', include('contact.urls')),
     path('', api_root, name='api-root'),
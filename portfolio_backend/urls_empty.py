@@ -0,0 +1,9 @@
+"""
+Empty URL configuration for the Celery worker and beat profiles.
+
+Celery's Django fixup runs the system checks on startup, and the URL checks
+import ROOT_URLCONF. Processes that serve no HTTP use this one so they do not
+load the admin, DRF and the views.
+"""
+
+urlpatterns = []